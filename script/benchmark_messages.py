@@ -0,0 +1,115 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the CPU cost of handling Genesys text messages.
+
+Reports microseconds of CPU per `ping` (including the `pong` sent back)
+and per `open` of a connection probe, which parses and answers the open
+without connecting to CES. Each is measured with logging off and with
+INFO logging formatted as JSON to /dev/null:
+
+    python -m script.benchmark_messages --count 20000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from script.measure_session_memory import _IdleSocket
+from src.ces_ws import CESWS
+from src.genesys_ws import GenesysWS
+from src.logging_utils import JSONFormatter
+
+PING = json.dumps(
+    {
+        "version": "2",
+        "type": "ping",
+        "seq": 2,
+        "serverseq": 1,
+        "id": "e160e428-53e2-487c-977d-96989bf5c99d",
+        "parameters": {},
+    }
+)
+PROBE_OPEN = json.dumps(
+    {
+        "version": "2",
+        "type": "open",
+        "seq": 1,
+        "serverseq": 0,
+        "id": "e160e428-53e2-487c-977d-96989bf5c99d",
+        "position": "PT0S",
+        "parameters": {
+            "organizationId": "d7934305-0972-4844-938e-9060eef73d05",
+            "conversationId": "00000000-0000-0000-0000-000000000000",
+            "participant": {
+                "id": "883efee8-3d6c-4537-b500-6d7ca4b92fa0",
+                "ani": "+1-555-555-1234",
+                "aniName": "John Doe",
+                "dnis": "+1-800-555-6789",
+            },
+            "media": [
+                {
+                    "type": "audio",
+                    "format": "PCMU",
+                    "channels": ["external", "internal"],
+                    "rate": 8000,
+                }
+            ],
+            "inputVariables": {"_agent_id": "projects/p/locations/us/apps/a"},
+        },
+    }
+)
+
+
+async def _microseconds_per_message(message, count):
+    session = GenesysWS(_IdleSocket(), "benchmark")
+    session.ces_ws = CESWS(session, session.adapter_session_id)
+    started = time.process_time()
+    for _ in range(count):
+        await session.handle_text_message(message)
+    return round((time.process_time() - started) / count * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--count", type=int, default=20000, help="Messages handled per measurement."
+    )
+    args = parser.parse_args()
+
+    root = logging.getLogger()
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(JSONFormatter())
+    root.handlers[:] = [handler]
+
+    for level in ("WARNING", "INFO"):
+        root.setLevel(level)
+        print(
+            json.dumps(
+                {
+                    "log_level": level,
+                    "ping_us": asyncio.run(_microseconds_per_message(PING, args.count)),
+                    "probe_open_us": asyncio.run(
+                        _microseconds_per_message(PROBE_OPEN, args.count)
+                    ),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
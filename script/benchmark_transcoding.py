@@ -0,0 +1,84 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures transcoding throughput for each Genesys/CES format pair.
+
+Reports how many 20 ms frames one core converts per second in each
+direction. Dividing by 50 gives the number of calls one core could
+transcode in that direction if it did nothing else:
+
+    python -m script.benchmark_transcoding --seconds 2
+"""
+
+import argparse
+import json
+import os
+import time
+
+from src.audio import SAMPLE_WIDTHS, Transcoder
+
+GENESYS_MEDIA = [("MULAW", 8000), ("LINEAR16", 8000), ("LINEAR16", 16000)]
+CES_AUDIO = [("MULAW", 8000), ("LINEAR16", 8000), ("LINEAR16", 16000)]
+FRAME_SECONDS = 0.02
+
+
+def _frames_per_second(transcoder, frame, seconds):
+    frames = 0
+    started = time.process_time()
+    deadline = started + seconds
+    while time.process_time() < deadline:
+        for _ in range(100):
+            transcoder.convert(frame)
+        frames += 100
+    return round(frames / (time.process_time() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--seconds", type=float, default=1.0, help="CPU seconds per measurement."
+    )
+    args = parser.parse_args()
+
+    results = []
+    for genesys_encoding, genesys_rate in GENESYS_MEDIA:
+        for ces_encoding, ces_rate in CES_AUDIO:
+            genesys_frame = os.urandom(
+                int(genesys_rate * FRAME_SECONDS) * SAMPLE_WIDTHS[genesys_encoding]
+            )
+            ces_frame = os.urandom(
+                int(ces_rate * FRAME_SECONDS) * SAMPLE_WIDTHS[ces_encoding]
+            )
+            inbound = Transcoder(genesys_encoding, genesys_rate, ces_encoding, ces_rate)
+            outbound = Transcoder(
+                ces_encoding, ces_rate, genesys_encoding, genesys_rate
+            )
+            results.append(
+                {
+                    "genesys": f"{genesys_encoding}/{genesys_rate}",
+                    "ces": f"{ces_encoding}/{ces_rate}",
+                    "inbound_frames_per_second": _frames_per_second(
+                        inbound, genesys_frame, args.seconds
+                    ),
+                    "outbound_frames_per_second": _frames_per_second(
+                        outbound, ces_frame, args.seconds
+                    ),
+                }
+            )
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
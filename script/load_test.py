@@ -0,0 +1,519 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Load test harness for the adapter.
+
+Runs the adapter in-process between simulated Genesys callers and a
+stand-in CES server on localhost, then reports call setup latency, CPU use,
+event loop lag and the jitter of the audio paced back to the callers:
+
+    python -m script.load_test --calls 200 --duration 30 --profile high_density
+
+Everything runs in one process, so the CPU figure includes the simulated
+callers and CES. Compare runs against each other rather than reading the
+numbers as absolute adapter cost.
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import websockets
+
+from src import auth, ces_ws, config, endpoints, metrics, offload, prompts, transport
+from src.main import get_loop_factory, handler
+
+LOCATION = "us"
+AGENT_ID = f"projects/load-test/locations/{LOCATION}/apps/load-test"
+FRAME_SIZE = 160  # 20 ms of 8 kHz PCMU
+CES_CHUNK_SECONDS = 0.2
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 4)
+
+
+async def _stand_in_token():
+    return "load-test-token"
+
+
+async def _stand_in_project_id():
+    return "load-test"
+
+
+def _delayed_handshake(delay, slow_fraction, slow_delay, fail_fraction):
+    """Returns a process_request hook that slows down or fails CES handshakes."""
+
+    async def process_request(connection, request):
+        if random.random() < slow_fraction:
+            await asyncio.sleep(slow_delay)
+        else:
+            await asyncio.sleep(delay)
+        if random.random() < fail_fraction:
+            return connection.respond(503, "Unavailable\n")
+
+    return process_request
+
+
+def _stand_in_ces(jitter, drop_after, large_message_kb=0):
+    """
+    Returns a CES stand-in that speaks continuously in 200 ms chunks and,
+    if `drop_after` is set, drops each connection after that many seconds.
+    With `large_message_kb`, it also sends a `sessionOutput` with about that
+    much diagnostic JSON every second.
+    """
+    audio = base64.b64encode(b"\xff" * int(8000 * CES_CHUNK_SECONDS)).decode("utf-8")
+    message = json.dumps({"sessionOutput": {"audio": audio}})
+    steps = [
+        {"id": i, "name": f"step-{i}", "latencyMs": i % 97}
+        for i in range(large_message_kb * 1024 // 45)
+    ]
+    large_message = json.dumps({"sessionOutput": {"diagnosticInfo": {"steps": steps}}})
+
+    async def serve(websocket):
+        await websocket.recv()  # config
+
+        async def speak():
+            next_send = asyncio.get_running_loop().time()
+            chunks = 0
+            while True:
+                next_send += CES_CHUNK_SECONDS
+                delay = (
+                    next_send
+                    - asyncio.get_running_loop().time()
+                    + random.uniform(-jitter, jitter)
+                )
+                await asyncio.sleep(max(0, delay))
+                await websocket.send(message)
+                chunks += 1
+                if large_message_kb and chunks % round(1 / CES_CHUNK_SECONDS) == 0:
+                    await websocket.send(large_message)
+
+        async def drop():
+            await asyncio.sleep(drop_after)
+            await websocket.close(1011, "Injected drop")
+
+        speaker = asyncio.create_task(speak())
+        dropper = asyncio.create_task(drop()) if drop_after else None
+        try:
+            async for received in websocket:
+                if config.DISCONNECT_EVENT_NAME in received:
+                    # Like CES, end the session on the disconnect event.
+                    speaker.cancel()
+                    await websocket.send(json.dumps({"endSession": {}}))
+        finally:
+            speaker.cancel()
+            if dropper:
+                dropper.cancel()
+
+    return serve
+
+
+async def _caller(url, duration, results, hold=0, custom_config=None):
+    async with websockets.connect(
+        url, max_size=transport.MAX_MESSAGE_SIZE
+    ) as websocket:
+        open_message = {
+            "version": "2",
+            "type": "open",
+            "seq": 1,
+            "serverseq": 0,
+            "id": str(uuid.uuid4()),
+            "parameters": {
+                "conversationId": str(uuid.uuid4()),
+                "inputVariables": {"_agent_id": AGENT_ID},
+                "media": [
+                    {
+                        "type": "audio",
+                        "format": "PCMU",
+                        "channels": ["external"],
+                        "rate": 8000,
+                    }
+                ],
+            },
+        }
+        if custom_config:
+            open_message["parameters"]["customConfig"] = custom_config
+        started = time.perf_counter()
+        await websocket.send(json.dumps(open_message))
+        while True:
+            message = await websocket.recv()
+            if isinstance(message, str) and json.loads(message).get("type") in (
+                "opened",
+                "disconnect",
+            ):
+                break
+        results["setup"].append(time.perf_counter() - started)
+
+        async def send_audio():
+            frame = b"\xff" * FRAME_SIZE
+            loop = asyncio.get_running_loop()
+            next_send = loop.time()
+            end = next_send + duration
+            # Audio keeps flowing during the hold, as on a call on hold.
+            hold_start, hold_end = (
+                next_send + (duration - hold) / 2,
+                next_send + (duration + hold) / 2,
+            )
+            seq = 1
+            while next_send < end:
+                if hold and (
+                    seq == 1
+                    and next_send >= hold_start
+                    or seq == 2
+                    and next_send >= hold_end
+                ):
+                    seq += 1
+                    await websocket.send(
+                        json.dumps(
+                            {
+                                "version": "2",
+                                "type": "paused" if seq == 2 else "resumed",
+                                "seq": seq,
+                                "serverseq": 0,
+                                "id": open_message["id"],
+                                "parameters": {},
+                            }
+                        )
+                    )
+                await websocket.send(frame)
+                next_send += FRAME_SIZE / 8000
+                await asyncio.sleep(max(0, next_send - loop.time()))
+
+        sender = asyncio.create_task(send_audio())
+        arrivals = []
+        first_audio = None
+        try:
+            async with asyncio.timeout(duration):
+                async for message in websocket:
+                    if isinstance(message, bytes):
+                        first_audio = first_audio or time.perf_counter()
+                        # The stand-in CES only speaks silence, so anything
+                        # else is a cached prompt and not part of the stream.
+                        if not message.strip(b"\xff"):
+                            arrivals.append((time.perf_counter(), len(message)))
+                    elif json.loads(message).get("type") == "disconnect":
+                        results["disconnects"] += 1
+        except TimeoutError:
+            pass
+        await sender
+        if first_audio:
+            results["first_audio"].append(first_audio - started)
+
+        # End the call as Genesys does and time the 'closed' acknowledgement.
+        close_sent = time.perf_counter()
+        try:
+            await websocket.send(
+                json.dumps(
+                    {
+                        "version": "2",
+                        "type": "close",
+                        "seq": 4 if hold else 2,
+                        "serverseq": 0,
+                        "id": open_message["id"],
+                        "parameters": {"reason": "end"},
+                    }
+                )
+            )
+            async with asyncio.timeout(10):
+                async for message in websocket:
+                    if (
+                        isinstance(message, str)
+                        and json.loads(message).get("type") == "closed"
+                    ):
+                        results["close"].append(time.perf_counter() - close_sent)
+                        break
+        except (TimeoutError, websockets.exceptions.ConnectionClosed):
+            pass
+
+    # Replay the arrivals against a player that starts with the first chunk.
+    if arrivals:
+        first = arrivals[0][0]
+        buffered_seconds = 0.0
+        for (arrived, size), previous in zip(arrivals, [None] + arrivals[:-1]):
+            lead = buffered_seconds - (arrived - first)
+            if lead < 0:
+                results["underruns"] += 1
+            results["leads"].append(lead)
+            if previous:
+                results["gaps"].append(arrived - previous[0])
+            buffered_seconds += size / 8000
+
+
+async def _monitor_loop_lag(lags):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + 0.01
+        await asyncio.sleep(0.01)
+        lags.append(loop.time() - expected)
+
+
+async def run(args):
+    auth.auth_provider.get_token = _stand_in_token
+    auth.auth_provider.get_project_id = _stand_in_project_id
+
+    async with contextlib.AsyncExitStack() as stack:
+        # One stand-in CES for the default endpoint, plus one per extra
+        # endpoint delay, each added on top of the common handshake delay.
+        ces_servers = []
+        for extra_delay in [0] + args.ces_endpoint_delays_ms:
+            ces_servers.append(
+                await stack.enter_async_context(
+                    websockets.serve(
+                        _stand_in_ces(
+                            args.ces_jitter_ms / 1000,
+                            args.ces_drop_after_s,
+                            args.ces_large_message_kb,
+                        ),
+                        "127.0.0.1",
+                        0,
+                        process_request=_delayed_handshake(
+                            (args.ces_connect_delay_ms + extra_delay) / 1000,
+                            args.ces_connect_slow_fraction,
+                            args.ces_connect_slow_ms / 1000,
+                            args.ces_connect_fail_fraction,
+                        ),
+                    )
+                )
+            )
+        ces_urls = [
+            f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+            for server in ces_servers
+        ]
+        ces_ws._BASE_WS_URL = ces_urls[0]
+        endpoints.selector = endpoints.EndpointSelector(
+            [(LOCATION, f"{url}{LOCATION}") for url in ces_urls[1:]]
+        )
+        async with websockets.serve(
+            handler, "127.0.0.1", 0, **transport.server_options()
+        ) as adapter:
+            adapter_port = adapter.sockets[0].getsockname()[1]
+            url = f"ws://127.0.0.1:{adapter_port}/"
+
+            results = {
+                "setup": [],
+                "gaps": [],
+                "leads": [],
+                "underruns": 0,
+                "disconnects": 0,
+                "close": [],
+                "first_audio": [],
+            }
+            lags = []
+            monitor = asyncio.create_task(_monitor_loop_lag(lags))
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+
+            async def delayed_caller(delay):
+                await asyncio.sleep(delay)
+                await _caller(
+                    url, args.duration, results, args.hold_seconds, args.custom_config
+                )
+
+            outcomes = await asyncio.gather(
+                *(
+                    delayed_caller(args.ramp * i / args.calls)
+                    for i in range(args.calls)
+                ),
+                return_exceptions=True,
+            )
+            cpu = time.process_time() - cpu_started
+            wall = time.perf_counter() - wall_started
+            monitor.cancel()
+
+    return {
+        "calls": args.calls,
+        "failed_calls": sum(
+            1 for outcome in outcomes if isinstance(outcome, Exception)
+        ),
+        "event_loop": args.loop,
+        "transport_profile": args.profile,
+        "pipelined_setup": args.pipelined_setup,
+        "legs": metrics.snapshot()["legs"],
+        "cpu_percent": round(100 * cpu / wall, 1),
+        "session_cpu_ms": metrics.snapshot()["summaries"].get("session_cpu_ms"),
+        "setup_seconds_p50": _percentile(results["setup"], 0.5),
+        "setup_seconds_p95": _percentile(results["setup"], 0.95),
+        "setup_ces_ready_ms": metrics.snapshot()["summaries"].get("setup_ces_ready_ms"),
+        "first_audio_seconds_p50": _percentile(results["first_audio"], 0.5),
+        "first_audio_seconds_p95": _percentile(results["first_audio"], 0.95),
+        "prompts": {
+            name: value
+            for name, value in metrics.snapshot()["counters"].items()
+            if name.startswith("prompts_")
+        },
+        "ces_endpoints": endpoints.selector.snapshot(),
+        "ces_connect": {
+            name: value
+            for name, value in metrics.snapshot()["counters"].items()
+            if name.startswith("ces_connect_")
+        },
+        "loop_lag_seconds_p99": _percentile(lags, 0.99),
+        "playback_gap_seconds_p50": _percentile(results["gaps"], 0.5),
+        "playback_gap_seconds_p99": _percentile(results["gaps"], 0.99),
+        "playback_lead_seconds_mean": (
+            round(statistics.fmean(results["leads"]), 4) if results["leads"] else None
+        ),
+        "playback_underruns": results["underruns"],
+        "disconnects": results["disconnects"],
+        "close_ack_seconds_p50": _percentile(results["close"], 0.5),
+        "close_ack_seconds_p95": _percentile(results["close"], 0.95),
+        "teardown_ms": metrics.snapshot()["summaries"].get("teardown_ms"),
+        "message_sizes": metrics.snapshot()["message_sizes"],
+        "offload_ms": metrics.snapshot()["summaries"].get("offload_ms"),
+        "custom_config_rejected": metrics.snapshot()["counters"].get(
+            "custom_config_rejected", 0
+        ),
+        "ces_resume": {
+            name: value
+            for name, value in metrics.snapshot()["counters"].items()
+            if name.startswith("ces_resume_")
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument(
+        "--duration", type=float, default=10, help="Seconds of audio per call."
+    )
+    parser.add_argument(
+        "--ramp", type=float, default=2, help="Seconds over which calls are started."
+    )
+    parser.add_argument(
+        "--profile",
+        default=config.TRANSPORT_PROFILE,
+        choices=sorted(transport.PROFILES),
+    )
+    parser.add_argument(
+        "--loop", default=config.EVENT_LOOP, choices=["asyncio", "uvloop"]
+    )
+    parser.add_argument(
+        "--genesys-compression",
+        default=config.GENESYS_WS_COMPRESSION,
+        choices=["none", "deflate"],
+    )
+    parser.add_argument(
+        "--ces-compression",
+        default=config.CES_WS_COMPRESSION,
+        choices=["none", "deflate"],
+    )
+    parser.add_argument(
+        "--ces-jitter-ms",
+        type=float,
+        default=0,
+        help="Random delay added to each CES audio chunk.",
+    )
+    parser.add_argument(
+        "--ces-connect-delay-ms",
+        type=float,
+        default=0,
+        help="Delay added to each CES handshake.",
+    )
+    parser.add_argument(
+        "--ces-connect-slow-fraction",
+        type=float,
+        default=0,
+        help="Fraction of CES handshakes delayed by --ces-connect-slow-ms instead.",
+    )
+    parser.add_argument("--ces-connect-slow-ms", type=float, default=3000)
+    parser.add_argument(
+        "--ces-endpoint-delays-ms",
+        type=lambda value: [float(v) for v in value.split(",")],
+        default=[],
+        help="Comma-separated extra handshake delays of additional stand-in CES"
+        " endpoints.",
+    )
+    parser.add_argument(
+        "--ces-connect-fail-fraction",
+        type=float,
+        default=0,
+        help="Fraction of CES handshakes rejected with HTTP 503.",
+    )
+    parser.add_argument(
+        "--ces-drop-after-s",
+        type=float,
+        default=0,
+        help="Seconds after which the stand-in CES drops each connection.",
+    )
+    parser.add_argument(
+        "--ces-large-message-kb",
+        type=int,
+        default=0,
+        help="Size of a large diagnostic message the stand-in CES sends every second.",
+    )
+    parser.add_argument(
+        "--offload-message-bytes", type=int, default=config.OFFLOAD_MESSAGE_BYTES
+    )
+    parser.add_argument(
+        "--ces-resume", action="store_true", default=config.CES_RESUME_ENABLED
+    )
+    parser.add_argument(
+        "--hold-seconds",
+        type=float,
+        default=0,
+        help="Seconds in the middle of each call during which Genesys has paused"
+        " the stream.",
+    )
+    parser.add_argument(
+        "--setup-prompt-file",
+        default=config.SETUP_PROMPT_FILE,
+        help="Prompt played while CES connects, with --pipelined-setup.",
+    )
+    parser.add_argument(
+        "--custom-config",
+        help="customConfig JSON sent in each open, for per-call settings.",
+    )
+    parser.add_argument(
+        "--pipelined-setup", action="store_true", default=config.PIPELINED_SETUP
+    )
+    args = parser.parse_args()
+
+    config.TRANSPORT_PROFILE = args.profile
+    config.EVENT_LOOP = args.loop
+    config.GENESYS_WS_COMPRESSION = args.genesys_compression
+    config.CES_WS_COMPRESSION = args.ces_compression
+    config.PIPELINED_SETUP = args.pipelined_setup
+    config.CES_RESUME_ENABLED = args.ces_resume
+    config.OFFLOAD_MESSAGE_BYTES = args.offload_message_bytes
+    config.SETUP_PROMPT_FILE = args.setup_prompt_file
+    prompts.load()
+    logging.disable(logging.CRITICAL)
+    if config.OFFLOAD_MESSAGE_BYTES > 0:
+        offload.start()
+    result = asyncio.run(run(args), loop_factory=get_loop_factory())
+    print(json.dumps(result))
+    if (
+        args.ces_drop_after_s
+        and args.ces_resume
+        and args.ces_drop_after_s < args.duration
+    ):
+        # Every call outlives the injected drop, so each must have resumed.
+        if not result["ces_resume"].get("ces_resume_attempts"):
+            sys.exit("CES connections were dropped but no session tried to resume")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the fixed memory cost of a call.
+
+Opens thousands of simulated sessions against in-memory stand-ins for the
+Genesys and CES sockets and reports the bytes allocated per idle session
+(just accepted) and per active session (CES connected, listener and pacer
+running). Exits non-zero if either exceeds its budget, so it can be used
+as a regression gate:
+
+    python -m script.measure_session_memory --sessions 2000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import sys
+import tracemalloc
+
+from websockets.protocol import State
+
+from src.ces_ws import CESWS
+from src.genesys_ws import GenesysWS
+
+
+class _IdleSocket:
+    """A WebSocket stand-in that accepts sends and never receives."""
+
+    state = State.OPEN
+
+    async def send(self, message):
+        pass
+
+    async def recv(self):
+        await asyncio.Event().wait()
+
+
+def _traced_bytes():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+async def _measure(count):
+    sessions = []
+    baseline = _traced_bytes()
+    for i in range(count):
+        genesys_ws = GenesysWS(_IdleSocket(), f"session-{i}")
+        genesys_ws.ces_ws = CESWS(genesys_ws, genesys_ws.adapter_session_id)
+        sessions.append(genesys_ws)
+    idle = _traced_bytes()
+
+    for genesys_ws in sessions:
+        ces_ws = genesys_ws.ces_ws
+        ces_ws.session_id = (
+            f"projects/p/locations/l/apps/a/sessions/{genesys_ws.adapter_session_id}"
+        )
+        ces_ws._create_audio_resources()
+        ces_ws.websocket = _IdleSocket()
+        ces_ws.listen_task = asyncio.create_task(ces_ws.listen())
+        ces_ws.pacer_task = asyncio.create_task(ces_ws.pacer())
+    await asyncio.sleep(0.1)
+    active = _traced_bytes()
+
+    for genesys_ws in sessions:
+        genesys_ws.ces_ws.listen_task.cancel()
+        genesys_ws.ces_ws.pacer_task.cancel()
+    await asyncio.gather(
+        *(t for s in sessions for t in (s.ces_ws.listen_task, s.ces_ws.pacer_task)),
+        return_exceptions=True,
+    )
+    return (idle - baseline) / count, (active - baseline) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--max-idle-bytes", type=int, default=4096)
+    parser.add_argument("--max-active-bytes", type=int, default=16384)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    tracemalloc.start()
+    idle, active = asyncio.run(_measure(args.sessions))
+    tracemalloc.stop()
+
+    report = {
+        "sessions": args.sessions,
+        "bytes_per_idle_session": round(idle),
+        "bytes_per_active_session": round(active),
+    }
+    print(json.dumps(report))
+    if idle > args.max_idle_bytes or active > args.max_active_bytes:
+        print("Session memory budget exceeded", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
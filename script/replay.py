@@ -0,0 +1,221 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Replays captured sessions through the adapter.
+
+Feeds the Genesys and CES traffic of capture files written with CAPTURE_DIR
+back through the adapter in-process, between a simulated Genesys client
+and a stand-in CES, with the original timing scaled by --speed. Reports
+setup latency, the jitter of the audio paced back to Genesys, event loop
+lag and CPU use:
+
+    python -m script.replay captures/*.cap --speed 4
+
+Captured `inputVariables` are redacted unless LOG_UNREDACTED_DATA was
+'true', so replayed sessions are opened against a stand-in agent.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+import websockets
+
+from script.load_test import (
+    AGENT_ID,
+    _monitor_loop_lag,
+    _percentile,
+    _stand_in_project_id,
+    _stand_in_token,
+)
+from src import auth, capture, ces_ws, config, endpoints, transport
+from src.main import get_loop_factory, handler
+
+
+class Session:
+    """The replayable parts of one capture file."""
+
+    def __init__(self, key, path):
+        self.key = key
+        self.genesys_in = []
+        self.ces_in = []
+        ces_configured_at = None
+        for timestamp, direction, payload in capture.read_capture(path):
+            if direction == capture.GENESYS_IN:
+                self.genesys_in.append((timestamp, payload))
+            elif direction == capture.CES_IN:
+                self.ces_in.append((timestamp, payload))
+            elif direction == capture.CES_OUT and ces_configured_at is None:
+                ces_configured_at = timestamp
+        # CES output is replayed relative to when the session was configured.
+        ces_configured_at = ces_configured_at or 0.0
+        self.ces_in = [
+            (timestamp - ces_configured_at, payload)
+            for timestamp, payload in self.ces_in
+        ]
+
+    def open_message(self, payload):
+        """Points a captured `open` message at the stand-in agent and session."""
+        message = json.loads(payload)
+        parameters = message.setdefault("parameters", {})
+        input_variables = parameters.get("inputVariables")
+        if not isinstance(input_variables, dict):
+            input_variables = {}
+        input_variables.pop("_deployment_id", None)
+        input_variables["_agent_id"] = AGENT_ID
+        input_variables["_session_id"] = self.key
+        parameters["inputVariables"] = input_variables
+        return json.dumps(message)
+
+
+async def _play(records, send, speed):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for timestamp, payload in records:
+        await asyncio.sleep(max(0, started + timestamp / speed - loop.time()))
+        await send(payload)
+
+
+def _stand_in_ces(sessions, speed):
+    """Returns a CES stand-in that replays the CES output of each session."""
+
+    async def serve(websocket):
+        config_message = json.loads(await websocket.recv())
+        key = config_message["config"]["session"].rsplit("/", 1)[-1]
+        session = sessions.get(key)
+        player = asyncio.create_task(
+            _play(session.ces_in if session else [], websocket.send, speed)
+        )
+        try:
+            async for _ in websocket:
+                pass
+        finally:
+            player.cancel()
+
+    return serve
+
+
+async def _genesys(url, session, speed, results):
+    async with websockets.connect(
+        url, max_size=transport.MAX_MESSAGE_SIZE
+    ) as websocket:
+        arrivals = []
+        opened_at = None
+        sent_open_at = None
+
+        async def send(payload):
+            nonlocal sent_open_at
+            if isinstance(payload, str) and json.loads(payload).get("type") == "open":
+                payload = session.open_message(payload)
+                sent_open_at = time.perf_counter()
+            await websocket.send(payload)
+
+        async def receive():
+            nonlocal opened_at
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    arrivals.append(time.perf_counter())
+                elif opened_at is None and json.loads(message).get("type") == "opened":
+                    opened_at = time.perf_counter()
+
+        receiver = asyncio.create_task(receive())
+        try:
+            await _play(session.genesys_in, send, speed)
+            await asyncio.sleep(1)  # Let the last responses arrive.
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        receiver.cancel()
+
+    if opened_at and sent_open_at:
+        results["setup"].append(opened_at - sent_open_at)
+    results["gaps"].extend(
+        later - earlier for earlier, later in zip(arrivals, arrivals[1:])
+    )
+
+
+async def run(args):
+    auth.auth_provider.get_token = _stand_in_token
+    auth.auth_provider.get_project_id = _stand_in_project_id
+    sessions = {
+        f"replay-{index}": Session(f"replay-{index}", path)
+        for index, path in enumerate(args.captures)
+    }
+
+    async with websockets.serve(
+        _stand_in_ces(sessions, args.speed), "127.0.0.1", 0
+    ) as ces_server:
+        ces_ws._BASE_WS_URL = (
+            f"ws://127.0.0.1:{ces_server.sockets[0].getsockname()[1]}/"
+        )
+        endpoints.selector = endpoints.EndpointSelector([])
+        async with websockets.serve(
+            handler, "127.0.0.1", 0, **transport.server_options()
+        ) as adapter:
+            url = f"ws://127.0.0.1:{adapter.sockets[0].getsockname()[1]}/"
+            results = {"setup": [], "gaps": []}
+            lags = []
+            monitor = asyncio.create_task(_monitor_loop_lag(lags))
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            outcomes = await asyncio.gather(
+                *(
+                    _genesys(url, session, args.speed, results)
+                    for session in sessions.values()
+                ),
+                return_exceptions=True,
+            )
+            cpu = time.process_time() - cpu_started
+            wall = time.perf_counter() - wall_started
+            monitor.cancel()
+
+    return {
+        "sessions": len(sessions),
+        "failed_sessions": sum(
+            1 for outcome in outcomes if isinstance(outcome, Exception)
+        ),
+        "speed": args.speed,
+        "cpu_percent": round(100 * cpu / wall, 1),
+        "setup_seconds_p50": _percentile(results["setup"], 0.5),
+        "setup_seconds_p95": _percentile(results["setup"], 0.95),
+        "loop_lag_seconds_p99": _percentile(lags, 0.99),
+        "playback_gap_seconds_p50": _percentile(results["gaps"], 0.5),
+        "playback_gap_seconds_p99": _percentile(results["gaps"], 0.99),
+        "playback_gap_seconds_stdev": (
+            round(statistics.pstdev(results["gaps"]), 4) if results["gaps"] else None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "captures", nargs="+", help="Capture files to replay concurrently."
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay speed; 2 plays captures twice as fast.",
+    )
+    args = parser.parse_args()
+
+    config.CAPTURE_DIR = ""  # Do not capture the replay itself.
+    logging.disable(logging.CRITICAL)
+    print(json.dumps(asyncio.run(run(args), loop_factory=get_loop_factory())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Authenticated /admin/ endpoints for live introspection and profiling.
+
+Nothing here runs until an endpoint is called: the profiler and tracemalloc
+are only active for the duration of a request.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import http
+import io
+import json
+import logging
+import pstats
+import time
+import tracemalloc
+import urllib.parse
+
+from . import config, debug_logging, metrics, sessions
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SORT_KEYS = ("tottime", "cumulative", "ncalls")
+PROFILE_LINES = 40
+TRACEMALLOC_LINES = 30
+
+_profiling = False
+
+
+def _authorized(request) -> bool:
+    received_key = request.headers.get("x-admin-key", "")
+    return hmac.compare_digest(received_key.encode(), config.ADMIN_API_KEY.encode())
+
+
+def _json(connection, data):
+    return connection.respond(http.HTTPStatus.OK, json.dumps(data) + "\n")
+
+
+def _sessions(connection, query):
+    now = time.monotonic()
+    rows = [sessions.describe(session, now) for session in sessions.active()]
+    if "top" in query:
+        try:
+            top = int(query["top"][0])
+        except ValueError:
+            return connection.respond(http.HTTPStatus.BAD_REQUEST, "Invalid top\n")
+        rows = sorted(rows, key=lambda row: row["cpu_ms"], reverse=True)[:top]
+    return _json(connection, rows)
+
+
+async def _profile(connection, query):
+    global _profiling
+    try:
+        seconds = float(query.get("seconds", ["5"])[0])
+    except ValueError:
+        return connection.respond(http.HTTPStatus.BAD_REQUEST, "Invalid seconds\n")
+    seconds = min(max(seconds, 0.1), config.ADMIN_PROFILE_MAX_SECONDS)
+    sort_key = query.get("sort", ["tottime"])[0]
+    if sort_key not in PROFILE_SORT_KEYS:
+        return connection.respond(http.HTTPStatus.BAD_REQUEST, f"sort must be one of {', '.join(PROFILE_SORT_KEYS)}\n")
+    if _profiling:
+        return connection.respond(http.HTTPStatus.CONFLICT, "A profile is already running\n")
+
+    # The event loop thread runs all session code, so profiling it for the
+    # window shows which code paths the calls are spending CPU in.
+    logger.info("Starting CPU profile", extra={"log_type": "admin_profile", "seconds": seconds})
+    _profiling = True
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        _profiling = False
+
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats(sort_key).print_stats(PROFILE_LINES)
+    return connection.respond(http.HTTPStatus.OK, output.getvalue())
+
+
+def _tracemalloc(connection, query):
+    action = query.get("action", ["snapshot"])[0]
+    if action == "start":
+        frames = int(query.get("frames", ["1"])[0])
+        tracemalloc.start(frames)
+        logger.info("Started tracemalloc", extra={"log_type": "admin_tracemalloc", "frames": frames})
+        return connection.respond(http.HTTPStatus.OK, "Started\n")
+    if action == "stop":
+        tracemalloc.stop()
+        logger.info("Stopped tracemalloc", extra={"log_type": "admin_tracemalloc"})
+        return connection.respond(http.HTTPStatus.OK, "Stopped\n")
+    if action != "snapshot":
+        return connection.respond(http.HTTPStatus.BAD_REQUEST, "action must be start, snapshot or stop\n")
+    if not tracemalloc.is_tracing():
+        return connection.respond(http.HTTPStatus.CONFLICT, "tracemalloc is not started\n")
+
+    current, peak = tracemalloc.get_traced_memory()
+    statistics = tracemalloc.take_snapshot().statistics("lineno")
+    return _json(connection, {
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "top": [
+            {"location": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+            for stat in statistics[:TRACEMALLOC_LINES]
+        ],
+    })
+
+
+def _debug(connection, query):
+    action = query.get("action", ["list"])[0]
+    conversation_ids = query.get("conversation_id", [])
+    agent_ids = query.get("agent_id", [])
+    if action in ("add", "remove"):
+        if not conversation_ids and not agent_ids:
+            return connection.respond(http.HTTPStatus.BAD_REQUEST, "conversation_id or agent_id is required\n")
+        debug_logging.set_targets(action == "add", conversation_ids, agent_ids)
+        logger.info("Changed per-session debug logging", extra={"log_type": "admin_debug", "action": action, "conversation_ids": conversation_ids, "agent_ids": agent_ids})
+    elif action == "clear":
+        debug_logging.clear()
+        logger.info("Cleared per-session debug logging", extra={"log_type": "admin_debug"})
+    elif action != "list":
+        return connection.respond(http.HTTPStatus.BAD_REQUEST, "action must be list, add, remove or clear\n")
+    return _json(connection, debug_logging.targets())
+
+
+async def handle(connection, request):
+    """Serves an /admin/ request, or returns a 401 or 404 response."""
+    if not config.ADMIN_API_KEY:
+        return connection.respond(http.HTTPStatus.NOT_FOUND, "Not Found\n")
+    if not _authorized(request):
+        metrics.increment("admin_auth_failures")
+        logger.warning("Admin request rejected: invalid admin key.", extra={"log_type": "admin_auth_error"})
+        return connection.respond(http.HTTPStatus.UNAUTHORIZED, "Unauthorized\n")
+
+    url = urllib.parse.urlsplit(request.path)
+    query = urllib.parse.parse_qs(url.query)
+    if url.path == "/admin/metrics":
+        return _json(connection, metrics.snapshot())
+    if url.path == "/admin/sessions":
+        return _sessions(connection, query)
+    if url.path == "/admin/profile":
+        return await _profile(connection, query)
+    if url.path == "/admin/tracemalloc":
+        return _tracemalloc(connection, query)
+    if url.path == "/admin/debug":
+        return _debug(connection, query)
+    return connection.respond(http.HTTPStatus.NOT_FOUND, "Not Found\n")
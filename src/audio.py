@@ -0,0 +1,239 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Audio media negotiation, channel demux and transcoding."""
+
+import audioop
+import collections
+
+from . import metrics
+
+# AudioHook channel carrying the customer's audio.
+CUSTOMER_CHANNEL = "external"
+
+# CES encoding names for the Genesys media formats, and the sample rates
+# accepted for each. AudioHook L16 is 16-bit little-endian PCM.
+GENESYS_FORMATS = {"PCMU": "MULAW", "L16": "LINEAR16"}
+GENESYS_RATES = {"PCMU": (8000,), "L16": (8000, 16000)}
+
+SAMPLE_WIDTHS = {"MULAW": 1, "LINEAR16": 2}
+
+
+def _build_ulaw_tables():
+    """Builds translate() tables giving the low and high byte of each
+    G.711 mu-law code point decoded to 16-bit little-endian PCM."""
+    low, high = bytearray(256), bytearray(256)
+    for code in range(256):
+        inverted = ~code & 0xFF
+        exponent = (inverted >> 4) & 0x07
+        magnitude = ((((inverted & 0x0F) << 3) + 0x84) << exponent) - 0x84
+        sample = (-magnitude if inverted & 0x80 else magnitude) & 0xFFFF
+        low[code], high[code] = sample & 0xFF, sample >> 8
+    return bytes(low), bytes(high)
+
+
+_ULAW_LOW_BYTES, _ULAW_HIGH_BYTES = _build_ulaw_tables()
+
+
+def _channels(media_option: dict) -> list:
+    # An offer without `channels` is mono customer audio.
+    return media_option.get("channels") or [CUSTOMER_CHANNEL]
+
+
+def select_media(offered_media: list, formats=("PCMU",)) -> dict | None:
+    """Selects the media offer to accept from a Genesys `open` message.
+
+    Offers are considered in the order of `formats`. Only offers at a
+    supported sample rate that carry the customer channel qualify. Within a
+    format a mono offer is preferred; otherwise a multi-channel offer is
+    accepted and the customer channel is extracted with `demux`.
+
+    Args:
+        offered_media: The `media` list from the `open` parameters.
+        formats: Accepted Genesys formats, most preferred first.
+
+    Returns:
+        The selected offer, or None if no offer is compatible.
+    """
+    for media_format in formats:
+        selected_media = None
+        for media_option in offered_media:
+            if (
+                media_option.get("type") != "audio"
+                or media_option.get("format") != media_format
+                or media_option.get("rate") not in GENESYS_RATES.get(media_format, ())
+                or CUSTOMER_CHANNEL not in _channels(media_option)
+            ):
+                continue
+            if len(_channels(media_option)) == 1:
+                return media_option
+            if selected_media is None:
+                selected_media = media_option
+        if selected_media:
+            return selected_media
+    return None
+
+
+def customer_channel_layout(media_option: dict) -> tuple[int, int]:
+    """Returns the (index, count) of the customer channel in interleaved frames."""
+    channels = _channels(media_option)
+    return channels.index(CUSTOMER_CHANNEL), len(channels)
+
+
+def demux(frame: bytes, channel_index: int, channel_count: int, sample_width: int = 1) -> bytes:
+    """Extracts one channel from an interleaved frame.
+
+    Extended slicing (of a memoryview for 16-bit samples) copies every
+    `channel_count`-th sample in C, so there is no per-sample Python loop.
+    A trailing partial sample frame is dropped and counted rather than
+    failing the call.
+    """
+    partial = len(frame) % (sample_width * channel_count)
+    if partial:
+        metrics.increment("demux_partial_frames")
+        frame = frame[:-partial]
+    if sample_width == 1:
+        return frame[channel_index::channel_count]
+    return memoryview(frame).cast("h")[channel_index::channel_count].tobytes()
+
+
+class Transcoder:
+    """Converts a stream of audio frames between encodings and sample rates.
+
+    Mu-law is decoded with translate() tables into a reusable buffer, and
+    resampling keeps `audioop.ratecv` state across frames so that frame
+    boundaries do not click. Matching formats pass through untouched.
+
+    The returned buffer is only valid until the next call to `convert`.
+    """
+
+    __slots__ = ("source_encoding", "source_rate", "target_encoding", "target_rate", "_passthrough", "_linear", "_ratecv_state")
+
+    def __init__(self, source_encoding: str, source_rate: int, target_encoding: str, target_rate: int):
+        self.source_encoding = source_encoding
+        self.source_rate = source_rate
+        self.target_encoding = target_encoding
+        self.target_rate = target_rate
+        self._passthrough = source_encoding == target_encoding and source_rate == target_rate
+        self._linear = bytearray()
+        self._ratecv_state = None
+
+    def _decode_ulaw(self, data):
+        size = 2 * len(data)
+        if len(self._linear) != size:
+            self._linear = bytearray(size)
+        self._linear[0::2] = data.translate(_ULAW_LOW_BYTES)
+        self._linear[1::2] = data.translate(_ULAW_HIGH_BYTES)
+        return self._linear
+
+    def convert(self, data: bytes) -> bytes:
+        if self._passthrough:
+            return data
+        linear = self._decode_ulaw(data) if self.source_encoding == "MULAW" else data
+        if self.source_rate != self.target_rate:
+            linear, self._ratecv_state = audioop.ratecv(linear, 2, 1, self.source_rate, self.target_rate, self._ratecv_state)
+        if self.target_encoding == "MULAW":
+            return audioop.lin2ulaw(linear, 2)
+        return linear
+
+
+class SilenceGate:
+    """Energy-based gate that thins silent inbound audio before CES.
+
+    Frames whose RMS level stays below `threshold` are held back once
+    `hangover` seconds of continuous silence have passed. The most recent
+    `pre_roll` seconds of held audio are sent together with the first loud
+    frame, so speech onsets are never clipped, and one frame is let through
+    every `keepalive` seconds so that CES still sees time passing.
+
+    Durations are derived from frame sizes rather than the wall clock.
+    """
+
+    __slots__ = (
+        "encoding", "bytes_per_second", "threshold", "hangover", "pre_roll",
+        "keepalive", "saved_bytes", "saved_messages", "_silence",
+        "_since_keepalive", "_held", "_held_bytes",
+    )
+
+    def __init__(self, encoding: str, sample_rate: int, threshold: int, hangover: float, pre_roll: float, keepalive: float):
+        self.encoding = encoding
+        self.bytes_per_second = sample_rate * SAMPLE_WIDTHS[encoding]
+        self.threshold = threshold
+        self.hangover = hangover
+        self.pre_roll = pre_roll
+        self.keepalive = keepalive
+        self.saved_bytes = 0
+        self.saved_messages = 0
+        self._silence = 0.0
+        self._since_keepalive = 0.0
+        self._held = collections.deque()
+        self._held_bytes = 0
+
+    @property
+    def silence(self) -> float:
+        """Seconds of continuous silence up to the last frame."""
+        return self._silence
+
+    def _level(self, frame):
+        if self.encoding == "MULAW":
+            return audioop.rms(audioop.ulaw2lin(frame, 2), 2)
+        return audioop.rms(frame, 2)
+
+    def process(self, frame: bytes) -> bytes | None:
+        """Returns the audio to send for `frame`, or None to skip it."""
+        if self._level(frame) >= self.threshold:
+            self._silence = 0.0
+            self._since_keepalive = 0.0
+            if not self._held:
+                return frame
+            # Speech onset: flush the pre-roll with this frame in one message.
+            self._unsave(self._held_bytes)
+            pre_roll = b"".join(self._held) + frame
+            self._held.clear()
+            self._held_bytes = 0
+            return pre_roll
+
+        duration = len(frame) / self.bytes_per_second
+        self._silence += duration
+        if self._silence <= self.hangover:
+            return frame
+
+        self._since_keepalive += duration
+        if self._since_keepalive >= self.keepalive:
+            # Held frames are older than this one, so they are dropped
+            # rather than sent out of order.
+            self._since_keepalive = 0.0
+            self._held.clear()
+            self._held_bytes = 0
+            return frame
+
+        # The frame may be a reused transcoder buffer, so keep a copy.
+        self._held.append(bytes(frame))
+        self._held_bytes += len(frame)
+        self._save(len(frame))
+        while self._held_bytes - len(self._held[0]) >= self.pre_roll * self.bytes_per_second:
+            self._held_bytes -= len(self._held.popleft())
+        return None
+
+    def _save(self, size):
+        self.saved_bytes += size
+        self.saved_messages += 1
+        metrics.increment("vad_saved_bytes", size)
+        metrics.increment("vad_saved_messages")
+
+    def _unsave(self, size):
+        # Held frames that end up being sent still save their messages,
+        # since they are merged into one, but not their bytes.
+        self.saved_bytes -= size
+        metrics.increment("vad_saved_bytes", -size)
@@ -21,10 +21,6 @@ import logging
 import re
 import time
 
-import google.auth
-from google.auth.transport import requests as google_auth_requests
-from google.cloud import secretmanager
-
 from . import config
 from .redaction import redact_value
 
@@ -35,7 +31,28 @@ class Auth:
     def __init__(self):
         self._token_info = {}
         self._lock = asyncio.Lock()
-        self._sm_client = None
+        self._credentials = None
+        self._project_id = None
+
+    async def _load_default_credentials(self):
+        # google.auth is imported lazily to keep it off the cold start path,
+        # and may query the metadata server, so it runs off the event loop.
+        if self._credentials is None:
+            import google.auth
+            self._credentials, self._project_id = await asyncio.to_thread(google.auth.default)
+        return self._credentials
+
+    async def get_project_id(self):
+        """Returns the project ID of the Application Default Credentials."""
+        if self._credentials is None:
+            async with self._lock:
+                await self._load_default_credentials()
+        return self._project_id
+
+    async def warm_up(self):
+        """Prefetches credentials and the CES token before the first call arrives."""
+        await self.get_project_id()
+        await self.get_token()
 
     async def get_token(self):
         async with self._lock:
@@ -47,23 +64,23 @@ class Auth:
                     await self._fetch_token_from_secret_manager()
                 return self._token_info["access_token"]
             else:
-                # ADC-based auth
-                creds, _ = google.auth.default()
-                auth_req = google_auth_requests.Request()
-                creds.refresh(auth_req)
+                # ADC-based auth. The cached credentials are only refreshed
+                # once they are about to expire.
+                creds = await self._load_default_credentials()
+                if not creds.valid:
+                    from google.auth.transport import requests as google_auth_requests
+                    await asyncio.to_thread(creds.refresh, google_auth_requests.Request())
                 return creds.token
 
     async def _fetch_token_from_secret_manager(self):
-        if not self._sm_client:
-            self._sm_client = secretmanager.SecretManagerServiceClient()
-
         secret_path = config.AUTH_TOKEN_SECRET_PATH
         if "/versions/" not in secret_path:
             secret_path = f"{secret_path}/versions/latest"
 
         try:
             logger.info("Fetching auth token from secret manager", extra={"secret_path": secret_path})
-            response = self._sm_client.access_secret_version(name=secret_path)
+            client = await asyncio.to_thread(config.get_secret_manager_client)
+            response = await asyncio.to_thread(client.access_secret_version, name=secret_path)
             payload = response.payload.data.decode("UTF-8")
             token_data = json.loads(payload)
 
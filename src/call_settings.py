@@ -0,0 +1,100 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-call audio tuning set from the Genesys `customConfig`.
+
+Each call starts from the process defaults in `config`. A flow may
+override any of the knobs below; values of the wrong type or out of range
+are rejected and the default is kept. `debug` has no process default: it
+makes the call a DEBUG logging target, as listed in `debug_logging`.
+"""
+
+from . import config
+
+# customConfig key -> (attribute, type, minimum, maximum, process default)
+_KNOBS = {
+    "pacerIntervalMs": ("pacer_interval_ms", int, 20, 1000, "PACER_INTERVAL_MS"),
+    "pacerInitialLeadMs": ("pacer_initial_lead_ms", int, 0, 2000, "PACER_INITIAL_LEAD_MS"),
+    "pacerMinLeadMs": ("pacer_min_lead_ms", int, 0, 2000, "PACER_MIN_LEAD_MS"),
+    "pacerMaxLeadMs": ("pacer_max_lead_ms", int, 0, 5000, "PACER_MAX_LEAD_MS"),
+    "inboundCoalesceMs": ("inbound_coalesce_ms", int, 0, 500, "INBOUND_COALESCE_MS"),
+    "vadEnabled": ("vad_enabled", bool, None, None, "VAD_ENABLED"),
+    "vadThreshold": ("vad_threshold", int, 0, 32767, "VAD_THRESHOLD"),
+    "vadHangoverMs": ("vad_hangover_ms", int, 0, 5000, "VAD_HANGOVER_MS"),
+    "vadPreRollMs": ("vad_pre_roll_ms", int, 0, 2000, "VAD_PRE_ROLL_MS"),
+    "vadKeepaliveMs": ("vad_keepalive_ms", int, 100, 60000, "VAD_KEEPALIVE_MS"),
+    "debug": ("debug", bool, None, None, None),
+}
+
+
+class CallSettings:
+    __slots__ = tuple(knob[0] for knob in _KNOBS.values())
+
+    def __init__(self):
+        for attribute, _, _, _, default in _KNOBS.values():
+            setattr(self, attribute, getattr(config, default) if default else False)
+
+
+def _coerce(value, kind):
+    # Flows often send every customConfig value as a string.
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        raise ValueError("expected true or false")
+    if isinstance(value, bool):
+        raise ValueError("expected an integer")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    raise ValueError("expected an integer")
+
+
+def from_custom_config(custom_config: dict) -> tuple:
+    """Builds the settings of a call.
+
+    Keys that are not knobs are ignored, since flows use customConfig for
+    other purposes too.
+
+    Returns:
+        The CallSettings, the applied overrides and the rejected ones, the
+        latter two as dicts of customConfig key to value and to reason.
+    """
+    settings = CallSettings()
+    applied, rejected = {}, {}
+    for key, value in custom_config.items():
+        knob = _KNOBS.get(key)
+        if knob is None:
+            continue
+        attribute, kind, minimum, maximum, _ = knob
+        try:
+            value = _coerce(value, kind)
+        except ValueError as exc:
+            rejected[key] = str(exc)
+            continue
+        if minimum is not None and not minimum <= value <= maximum:
+            rejected[key] = f"expected a value between {minimum} and {maximum}"
+            continue
+        setattr(settings, attribute, value)
+        applied[key] = value
+    if settings.pacer_min_lead_ms > settings.pacer_max_lead_ms:
+        for key in ("pacerMinLeadMs", "pacerMaxLeadMs"):
+            if key in applied:
+                del applied[key]
+                rejected[key] = "pacerMinLeadMs is above pacerMaxLeadMs"
+        settings.pacer_min_lead_ms = config.PACER_MIN_LEAD_MS
+        settings.pacer_max_lead_ms = config.PACER_MAX_LEAD_MS
+    return settings, applied, rejected
@@ -0,0 +1,167 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Opt-in capture of session traffic for offline replay.
+
+Each session is written to `<CAPTURE_DIR>/<adapter_session_id>.cap`: the
+MAGIC header followed by records of
+
+    timestamp  float64  seconds since the session started
+    direction  uint8    GENESYS_IN, GENESYS_OUT, CES_IN or CES_OUT
+    is_binary  uint8    1 for binary frames, 0 for text
+    length     uint32   payload length in bytes
+    payload    bytes    the frame, text encoded as UTF-8
+
+all little-endian. Payloads are redacted like logs: text messages through
+`redact`, and audio (binary frames and base64 `audio` fields) replaced by
+silence of the same length in its encoding, unless LOG_UNREDACTED_DATA is
+'true'.
+
+Frames are queued as received to a single writer thread, which redacts,
+frames and writes them, so neither parsing nor file I/O runs on the event
+loop.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+
+from . import config, metrics
+from .redaction import redact, redact_audio, unredacted
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CESCAP1\n"
+RECORD_HEADER = struct.Struct("<dBBI")
+
+GENESYS_IN = 0
+GENESYS_OUT = 1
+CES_IN = 2
+CES_OUT = 3
+
+WRITE_BUFFER_SIZE = 64 * 1024
+
+
+def _redact_text(payload: str) -> str:
+    if unredacted():
+        return payload
+    try:
+        data = json.loads(payload)
+    except json.JSONDecodeError:
+        return redact(payload)
+    if not isinstance(data, dict):
+        return redact(payload)
+    for section in ("realtimeInput", "sessionOutput"):
+        if isinstance(data.get(section), dict) and "audio" in data[section]:
+            data[section]["audio"] = redact_audio(data[section]["audio"], config.CES_AUDIO_ENCODING)
+    return json.dumps(redact(data))
+
+
+def _encode(timestamp: float, direction: int, payload: str | bytes, genesys_encoding: str) -> bytes:
+    if isinstance(payload, str):
+        data = _redact_text(payload).encode("utf-8")
+        is_binary = 0
+    else:
+        # Binary frames only travel on the Genesys leg.
+        data = redact_audio(payload, genesys_encoding)
+        is_binary = 1
+    return RECORD_HEADER.pack(timestamp, direction, is_binary, len(data)) + data
+
+
+class _Writer(threading.Thread):
+    """Appends queued records to their capture files."""
+
+    def __init__(self):
+        super().__init__(name="capture-writer", daemon=True)
+        self.queue = queue.SimpleQueue()
+        self._files = {}
+
+    def run(self):
+        while True:
+            path, record = self.queue.get()
+            if path is None:
+                break
+            try:
+                if record is None:
+                    capture_file = self._files.pop(path, None)
+                    if capture_file:
+                        capture_file.close()
+                    continue
+                data = _encode(*record)
+                capture_file = self._files.get(path)
+                if capture_file is None:
+                    capture_file = self._files[path] = open(path, "ab", buffering=WRITE_BUFFER_SIZE)
+                    if capture_file.tell() == 0:
+                        capture_file.write(MAGIC)
+                capture_file.write(data)
+            except (OSError, ValueError):
+                logger.error("Failed to write capture file", exc_info=True, extra={"log_type": "capture_error", "path": path})
+        for capture_file in self._files.values():
+            capture_file.close()
+
+    def stop(self):
+        self.queue.put((None, None))
+        self.join(timeout=5)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                os.makedirs(config.CAPTURE_DIR, exist_ok=True)
+                _writer = _Writer()
+                _writer.start()
+                atexit.register(_writer.stop)
+    return _writer
+
+
+class SessionCapture:
+    """Records the frames of one session into its capture file."""
+
+    __slots__ = ("path", "genesys_encoding", "_started", "_queue")
+
+    def __init__(self, adapter_session_id: str):
+        self.path = os.path.join(config.CAPTURE_DIR, f"{adapter_session_id}.cap")
+        self.genesys_encoding = "MULAW"  # Set once the media is negotiated
+        self._started = time.perf_counter()
+        self._queue = _get_writer().queue
+        metrics.increment("captured_sessions")
+
+    def record(self, direction: int, payload: str | bytes):
+        # Redaction is left to the writer thread; payloads are immutable.
+        self._queue.put((self.path, (time.perf_counter() - self._started, direction, payload, self.genesys_encoding)))
+
+    def close(self):
+        self._queue.put((self.path, None))
+
+
+def read_capture(path: str):
+    """Yields the (timestamp, direction, payload) records of a capture file."""
+    with open(path, "rb") as capture_file:
+        if capture_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        while header := capture_file.read(RECORD_HEADER.size):
+            timestamp, direction, is_binary, length = RECORD_HEADER.unpack(header)
+            data = capture_file.read(length)
+            yield timestamp, direction, data if is_binary else data.decode("utf-8")
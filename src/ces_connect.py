@@ -0,0 +1,169 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Deadline-bounded, hedged and retried CES WebSocket connection setup."""
+
+import asyncio
+import collections
+import logging
+import random
+import time
+
+import websockets
+
+from . import config, endpoints, metrics, transport
+
+logger = logging.getLogger(__name__)
+
+# Handshakes remembered for the hedge percentile, and how many are needed
+# before the percentile replaces CES_HEDGE_DELAY_MS.
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+# HTTP statuses from the CES front end that are worth retrying.
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HandshakeLatency:
+    """Rolling window of recent CES handshake durations, in seconds."""
+
+    __slots__ = ("_samples",)
+
+    def __init__(self):
+        self._samples = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        metrics.observe("ces_handshake_ms", seconds * 1000)
+
+    def percentile(self, fraction: float) -> float | None:
+        if len(self._samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+handshake_latency = HandshakeLatency()
+
+
+def hedge_delay() -> float | None:
+    """Returns the seconds after which a second handshake is started."""
+    if config.CES_HEDGE_PERCENTILE <= 0:
+        return None
+    observed = handshake_latency.percentile(config.CES_HEDGE_PERCENTILE / 100)
+    return observed if observed is not None else config.CES_HEDGE_DELAY_MS / 1000
+
+
+def is_retryable(error: Exception) -> bool:
+    """Returns True for connect failures that another attempt may not hit."""
+    if isinstance(error, websockets.exceptions.InvalidStatus):
+        return error.response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, (OSError, websockets.exceptions.InvalidHandshake))
+
+
+async def _handshake(url: str, headers: dict):
+    started = time.perf_counter()
+    metrics.increment("ces_connect_attempts")
+    try:
+        # The overall deadline is enforced by the caller.
+        websocket = await websockets.connect(url, additional_headers=headers, open_timeout=None, **transport.client_options())
+    except Exception:
+        endpoints.selector.record(url, error=True)
+        raise
+    elapsed = time.perf_counter() - started
+    handshake_latency.record(elapsed)
+    endpoints.selector.record(url, rtt=elapsed)
+    return websocket
+
+
+async def _discard(task: asyncio.Task):
+    """Closes the connection of a handshake that lost the race."""
+    if not task.done():
+        task.cancel()
+    try:
+        websocket = await task
+    except BaseException:
+        return
+    await websocket.close()
+
+
+async def _hedged_connect(url: str, hedge_url: str, headers: dict):
+    first = asyncio.create_task(_handshake(url, headers))
+    tasks = [first]
+    winner = None
+    try:
+        delay = hedge_delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                logger.info("CES handshake is slow, starting a hedged attempt", extra={"log_type": "ces_connect_hedge", "hedge_delay_ms": round(delay * 1000)})
+                metrics.increment("ces_connect_hedges")
+                tasks.append(asyncio.create_task(_handshake(hedge_url, headers)))
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = task
+                    break
+                error = task.exception()
+            if winner:
+                if winner is not first:
+                    metrics.increment("ces_connect_hedge_wins")
+                return winner.result()
+        raise error
+    finally:
+        # Handshakes still running, or that also succeeded, are closed in
+        # the background so that only the returned connection stays open.
+        for task in tasks:
+            if task is not winner and (not task.done() or (not task.cancelled() and task.exception() is None)):
+                asyncio.create_task(_discard(task))
+
+
+async def open_connection(urls: list[str], headers: dict):
+    """Opens a CES WebSocket to one of `urls` within the connect deadline.
+
+    Each attempt goes to the next URL in turn, starting with the first, and
+    is hedged with a handshake to the URL after it when it is slower than
+    usual. Retryable failures are retried with jittered exponential backoff
+    while attempts and time remain.
+
+    Raises:
+        TimeoutError: If no connection was established before the deadline.
+        Exception: The last connect error, if it was not retryable or no
+            retries remain.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config.CES_CONNECT_DEADLINE_MS / 1000
+    attempt = 0
+    while True:
+        try:
+            async with asyncio.timeout_at(deadline):
+                url = urls[attempt % len(urls)]
+                return await _hedged_connect(url, urls[(attempt + 1) % len(urls)], headers)
+        except Exception as e:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                metrics.increment("ces_connect_deadline_exceeded")
+                raise TimeoutError(f"CES connect did not complete within {config.CES_CONNECT_DEADLINE_MS} ms") from e
+            if attempt >= config.CES_CONNECT_RETRIES or not is_retryable(e):
+                metrics.increment("ces_connect_failures")
+                raise
+            attempt += 1
+            backoff = random.uniform(0, config.CES_CONNECT_BACKOFF_MS / 1000 * 2 ** (attempt - 1))
+            logger.warning("CES connect failed, retrying", extra={"log_type": "ces_connect_retry", "attempt": attempt, "backoff_ms": round(backoff * 1000), "error": str(e)})
+            metrics.increment("ces_connect_retries")
+            await asyncio.sleep(min(backoff, remaining))
@@ -16,13 +16,31 @@ import asyncio
 import base64
 import json
 import logging
+import time
+import urllib.parse
 import uuid
 
-import google.auth
 import websockets
 from websockets.connection import State
 
+from . import (
+    audio,
+    call_settings,
+    capture,
+    ces_connect,
+    circuit_breaker,
+    config,
+    debug_logging,
+    endpoints,
+    metrics,
+    offload,
+    offload_worker,
+    prompts,
+    sessions,
+)
+from .pacing import PlayoutClock
 from .auth import auth_provider
+from .transport import ces_leg, genesys_leg
 from .redaction import redact, redact_value
 from .config import DISCONNECT_EVENT_NAME
 
@@ -33,22 +51,82 @@ _BASE_WS_URL = (
     "BidiRunSession/locations/"
 )
 
+# Seconds of cached prompt audio kept queued in Genesys, which is about as
+# much as the caller still hears after a prompt is cancelled.
+PROMPT_LEAD = 0.1
+
+
+async def resolve_ces_host():
+    """Resolves the CES host names so the first calls do not pay for DNS."""
+    hosts = {urllib.parse.urlsplit(_BASE_WS_URL).hostname} | endpoints.selector.hosts()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.getaddrinfo(host, 443) for host in hosts))
+
 
 class CESWS:
+    # Slotted like GenesysWS. Queues and events are only created once a CES
+    # connection is attempted, so probe connections never allocate them.
+    __slots__ = (
+        "genesys_ws", "adapter_session_id", "websocket", "session_id",
+        "deployment_id", "initial_message", "audio_out_queue",
+        "pacer_send_buffer", "_stop_pacer_event", "pacer_task", "listen_task",
+        "endsession_received", "final_params", "genesys_sample_width",
+        "genesys_bytes_per_second", "inbound_transcoder", "outbound_transcoder",
+        "silence_gate", "playout_clock", "pre_connect_audio",
+        "breaker", "location", "resumes", "closing", "last_received_at",
+        "settings", "inbound_pending", "inbound_coalesce_bytes",
+        "setup_prompt", "waiting_prompt", "prompt", "prompt_sent",
+        "prompt_started", "awaiting_reply",
+    )
+
     def __init__(self, genesys_ws, adapter_session_id):
         self.genesys_ws = genesys_ws
         self.adapter_session_id = adapter_session_id
         self.websocket = None
         self.session_id = None
         self.deployment_id = None
-        self.audio_in_queue = asyncio.Queue() # Genesys to CES
-        self.audio_out_queue = asyncio.Queue() # CES to Genesys
-        self.pacer_send_buffer = bytearray() # Buffer for pacer
-        self._stop_pacer_event = asyncio.Event()
+        self.initial_message = None
+        self.audio_out_queue = None  # CES to Genesys
+        self.pacer_send_buffer = None  # Buffer for pacer
+        self._stop_pacer_event = None
         self.pacer_task = None
         self.listen_task = None
         self.endsession_received = False
-        self.final_params = {}
+        self.final_params = None
+        self.genesys_sample_width = 1
+        self.genesys_bytes_per_second = 8000
+        self.inbound_transcoder = None  # Genesys to CES
+        self.outbound_transcoder = None  # CES to Genesys
+        self.silence_gate = None
+        self.playout_clock = None
+        self.pre_connect_audio = None  # Caller audio held until CES is configured
+        self.breaker = None  # Circuit breaker of the CES location
+        self.location = None
+        self.resumes = 0
+        self.last_received_at = None  # For the watchdog
+        self.closing = False
+        self.settings = call_settings.CallSettings()  # Replaced by the Genesys `open`
+        self.inbound_pending = None  # Caller audio held to fill the coalescing window
+        self.inbound_coalesce_bytes = 0
+        self.setup_prompt = None  # Cached prompts in the Genesys format
+        self.waiting_prompt = None
+        self.prompt = None  # Prompt being played, if any
+        self.prompt_sent = 0
+        self.prompt_started = None
+        self.awaiting_reply = False  # The caller has spoken since CES last did
+
+    def _create_audio_resources(self):
+        if self.audio_out_queue is None:
+            self.audio_out_queue = asyncio.Queue()
+            self.pacer_send_buffer = bytearray()
+            self._stop_pacer_event = asyncio.Event()
+            self.playout_clock = PlayoutClock(
+                self.genesys_bytes_per_second,
+                interval=self.settings.pacer_interval_ms / 1000,
+                initial_lead=self.settings.pacer_initial_lead_ms / 1000,
+                min_lead=self.settings.pacer_min_lead_ms / 1000,
+                max_lead=self.settings.pacer_max_lead_ms / 1000,
+            )
 
     def _get_log_extra(self, log_type: str, data: dict = None):
         extra = {
@@ -63,6 +141,37 @@ class CESWS:
             extra.update(redact(data))
         return extra
 
+    def configure_audio(self, media):
+        """Sets up transcoding between the negotiated Genesys media and CES."""
+        encoding = audio.GENESYS_FORMATS[media["format"]]
+        rate = media["rate"]
+        self.genesys_sample_width = audio.SAMPLE_WIDTHS[encoding]
+        self.genesys_bytes_per_second = rate * self.genesys_sample_width
+        self.setup_prompt = prompts.get(prompts.SETUP, encoding, rate)
+        self.waiting_prompt = prompts.get(prompts.WAITING, encoding, rate)
+        if self.playout_clock:
+            self.playout_clock.bytes_per_second = self.genesys_bytes_per_second
+        self.inbound_transcoder = audio.Transcoder(encoding, rate, config.CES_AUDIO_ENCODING, config.CES_SAMPLE_RATE)
+        self.outbound_transcoder = audio.Transcoder(config.CES_AUDIO_ENCODING, config.CES_SAMPLE_RATE, encoding, rate)
+        settings = self.settings
+        if settings.vad_enabled:
+            self.silence_gate = audio.SilenceGate(
+                config.CES_AUDIO_ENCODING,
+                config.CES_SAMPLE_RATE,
+                threshold=settings.vad_threshold,
+                hangover=settings.vad_hangover_ms / 1000,
+                pre_roll=settings.vad_pre_roll_ms / 1000,
+                keepalive=settings.vad_keepalive_ms / 1000,
+            )
+        if settings.inbound_coalesce_ms:
+            self.inbound_coalesce_bytes = settings.inbound_coalesce_ms * config.CES_SAMPLE_RATE * audio.SAMPLE_WIDTHS[config.CES_AUDIO_ENCODING] // 1000
+            self.inbound_pending = bytearray()
+
+    async def _send(self, payload):
+        if self.genesys_ws.capture:
+            self.genesys_ws.capture.record(capture.CES_OUT, payload)
+        await ces_leg.send(self.websocket, payload)
+
     def is_connected(self):
         return self.websocket and self.websocket.state == State.OPEN
 
@@ -71,73 +180,128 @@ class CESWS:
         self.session_id = f"{agent_id}/sessions/{session_id_part}"
         self.deployment_id = deployment_id
         self.initial_message = initial_message
+        self._create_audio_resources()
+        if self.pre_connect_audio is None:
+            self.pre_connect_audio = bytearray()
 
         try:
-            _, project_id = google.auth.default()
-
             try:
                 parts = agent_id.split("/")
                 location_index = parts.index("locations")
                 location = parts[location_index + 1]
             except (ValueError, IndexError):
                 logger.error("Could not extract location from agent_id", extra=self._get_log_extra(log_type="ces_connect_error", data={"agent_id": agent_id}))
+                self.pre_connect_audio = None
                 return False
 
-            token = await auth_provider.get_token()
-            ws_url = f"{_BASE_WS_URL}{location}"
+            self.location = location
+            self.breaker = circuit_breaker.get(location)
+            if not self.breaker.allow():
+                logger.warning("CES circuit breaker is open, failing call fast", extra=self._get_log_extra(log_type="ces_circuit_open", data={"location": location}))
+                metrics.increment("circuit_breaker_rejected")
+                self.pre_connect_audio = None
+                if not self.genesys_ws.disconnect_initiated:
+                    await self.genesys_ws.send_disconnect("error", info=f"CES unavailable in {location}: circuit breaker open")
+                return False
 
-            logger.info("Connecting to CES", extra=self._get_log_extra(log_type="ces_connect", data={"url": ws_url}))
-            self.websocket = await websockets.connect(
-                ws_url,
-                additional_headers={
-                    "Authorization": f"Bearer {token}",
-                    "X-Goog-User-Project": project_id,
-                },
-                max_size=4 * 1024 * 1024  # Increase limit to 4MiB to prevent message size errors
-            )
-            logger.info("Connected to CES", extra=self._get_log_extra(log_type="ces_connect"))
+            await self._open_websocket()
             await self.send_config_message()
+            await self._flush_pre_connect_audio()
+            self.breaker.record_success()
+            self.last_received_at = time.monotonic()
             return True
         except Exception as e:
+            self.pre_connect_audio = None
+            if self.breaker:
+                self.breaker.record_failure()
             logger.error("Error during CES connect/config", exc_info=True, extra=self._get_log_extra(log_type="ces_connect_error"))
             if not self.genesys_ws.disconnect_initiated:
                 await self.genesys_ws.send_disconnect("error", info=f"CES Connection/Config Error: {e}")
             return False
 
-    async def send_config_message(self):
+    async def _open_websocket(self):
+        project_id, token = await asyncio.gather(auth_provider.get_project_id(), auth_provider.get_token())
+
+        # Configured endpoints for the location, best first, or else the
+        # global endpoint.
+        ws_urls = endpoints.selector.candidates(self.location) or [f"{_BASE_WS_URL}{self.location}"]
+
+        logger.info("Connecting to CES", extra=self._get_log_extra(log_type="ces_connect", data={"url": ws_urls[0]}))
+        self.websocket = await ces_connect.open_connection(
+            ws_urls,
+            {
+                "Authorization": f"Bearer {token}",
+                "X-Goog-User-Project": project_id,
+            },
+        )
+        if debug_logging.is_targeted(self.adapter_session_id):
+            debug_logging.trace_websocket(self.websocket, self.adapter_session_id)
+        logger.info("Connected to CES", extra=self._get_log_extra(log_type="ces_connect"))
+
+    async def resume(self):
+        """
+        Reconnects to CES after an unexpected close and re-sends the config
+        for the same session. Caller audio is held until the session is
+        configured again, while the pacer keeps playing out audio that was
+        already received. Returns False if the session could not be resumed
+        within the budget.
+        """
+        if self.resumes >= config.CES_RESUME_MAX_ATTEMPTS or not self.breaker.allow():
+            return False
+        self.resumes += 1
+        started = time.perf_counter()
+        metrics.increment("ces_resume_attempts")
+        logger.info("Resuming CES session", extra=self._get_log_extra(log_type="ces_resume", data={"attempt": self.resumes}))
+        self.pre_connect_audio = bytearray()
+        try:
+            async with asyncio.timeout(config.CES_RESUME_BUDGET_MS / 1000):
+                await self._open_websocket()
+                await self.send_config_message(resume=True)
+                await self._flush_pre_connect_audio()
+        except Exception as e:
+            self.pre_connect_audio = None
+            self.breaker.record_failure()
+            metrics.increment("ces_resume_failures")
+            logger.warning("Failed to resume CES session", exc_info=True, extra=self._get_log_extra(log_type="ces_resume_error", data={"error": str(e)}))
+            return False
+        self.breaker.record_success()
+        self.last_received_at = time.monotonic()
+        if self.closing:
+            # The call ended while reconnecting.
+            await self.websocket.close()
+            return False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.observe("ces_resume_ms", elapsed_ms)
+        logger.info("Resumed CES session", extra=self._get_log_extra(log_type="ces_resume", data={"elapsed_ms": round(elapsed_ms, 1)}))
+        return True
+
+    async def send_config_message(self, resume=False):
+        # The config, variables and kickstart messages are all built first and
+        # then written back to back; CES does not acknowledge them, so none of
+        # the writes has to wait for the others.
         config_message = {
             "config": {
                 "session": self.session_id,
                 "inputAudioConfig": {
-                    "audioEncoding": "MULAW",
-                    "sampleRateHertz": 8000,
+                    "audioEncoding": config.CES_AUDIO_ENCODING,
+                    "sampleRateHertz": config.CES_SAMPLE_RATE,
                 },
-                "outputAudioConfig": {                    "audioEncoding": "MULAW",
-                    "sampleRateHertz": 8000,
+                "outputAudioConfig": {
+                    "audioEncoding": config.CES_AUDIO_ENCODING,
+                    "sampleRateHertz": config.CES_SAMPLE_RATE,
                 },
             }
         }
         if self.deployment_id:
             config_message["config"]["deployment"] = self.deployment_id
-        try:
-            await self.websocket.send(json.dumps(config_message))
-        except Exception as e:
-            logger.error("Error sending config message to CES", exc_info=True, extra=self._get_log_extra(log_type="ces_send_config_error"))
-            raise
-        logger.info("Sent config message to CES", extra=self._get_log_extra(log_type="ces_send_config", data={"data": redact(config_message)}))
 
+        variables_message = None
         if self.genesys_ws.ces_input_variables:
             variables_message = {
                 "realtimeInput": {
                     "variables": self.genesys_ws.ces_input_variables
                 }
             }
-            try:
-                await self.websocket.send(json.dumps(variables_message))
-                logger.info("Sent variables to CES", extra=self._get_log_extra(log_type="ces_send_variables", data={"data": redact(variables_message)}))
-            except Exception as e:
-                logger.error("Error sending variables to CES", exc_info=True, extra=self._get_log_extra(log_type="ces_send_variables_error"))
-                raise
 
         if self.initial_message:
             kickstart_message = {
@@ -158,24 +322,94 @@ class CESWS:
             log_message = "Sent session_start event to CES"
             log_type = "ces_send_session_start"
 
+        config_payload = json.dumps(config_message)
+        if resume:
+            # The session already has its variables and has been started.
+            await self._send(config_payload)
+            logger.info("Sent config message to CES", extra=self._get_log_extra(log_type="ces_send_config", data={"data": redact(config_message)}))
+            return
+        variables_payload = json.dumps(variables_message) if variables_message else None
+        kickstart_payload = json.dumps(kickstart_message)
+
+        try:
+            await self._send(config_payload)
+        except Exception as e:
+            logger.error("Error sending config message to CES", exc_info=True, extra=self._get_log_extra(log_type="ces_send_config_error"))
+            raise
+        if variables_payload:
+            try:
+                await self._send(variables_payload)
+            except Exception as e:
+                logger.error("Error sending variables to CES", exc_info=True, extra=self._get_log_extra(log_type="ces_send_variables_error"))
+                raise
         try:
-            await self.websocket.send(json.dumps(kickstart_message))
-            logger.info(log_message, extra=self._get_log_extra(log_type=log_type, data={"data": kickstart_message}))
+            await self._send(kickstart_payload)
         except Exception as e:
             logger.error("Error sending kickstart/event message to CES", exc_info=True, extra=self._get_log_extra(log_type="ces_send_kickstart_error"))
             raise
 
+        logger.info("Sent config message to CES", extra=self._get_log_extra(log_type="ces_send_config", data={"data": redact(config_message)}))
+        if variables_message:
+            logger.info("Sent variables to CES", extra=self._get_log_extra(log_type="ces_send_variables", data={"data": redact(variables_message)}))
+        logger.info(log_message, extra=self._get_log_extra(log_type=log_type, data={"data": kickstart_message}))
+
+    def _buffer_pre_connect_audio(self, audio_chunk):
+        limit = config.PRE_CONNECT_BUFFER_MS * config.CES_SAMPLE_RATE * audio.SAMPLE_WIDTHS[config.CES_AUDIO_ENCODING] // 1000
+        self.pre_connect_audio.extend(audio_chunk)
+        excess = len(self.pre_connect_audio) - limit
+        if excess > 0:
+            # Keep the most recent audio; the sample width divides the limit.
+            del self.pre_connect_audio[:excess]
+            metrics.increment("pre_connect_audio_dropped_bytes", excess)
+
+    def _coalesce(self, audio_chunk):
+        # Returns the audio to send, or None while the window is filling. An
+        # empty chunk sends whatever is held.
+        pending = self.inbound_pending
+        pending += audio_chunk
+        if audio_chunk and len(pending) < self.inbound_coalesce_bytes:
+            return None
+        self.inbound_pending = bytearray()
+        return pending
+
+    async def _flush_pre_connect_audio(self):
+        buffered = self.pre_connect_audio
+        self.pre_connect_audio = None
+        if buffered:
+            logger.info("Flushing caller audio received during CES setup", extra=self._get_log_extra(log_type="ces_send_pre_connect_audio", data={"audio_size": len(buffered)}))
+            base64_payload = base64.b64encode(buffered).decode("utf-8")
+            await self._send(json.dumps({"realtimeInput": {"audio": base64_payload}}))
+
     async def send_audio(self, audio_chunk):
-        # Audio from Genesys is already 8kHz MULAW
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug("CESWS: send_audio: Received MULAW audio", extra=self._get_log_extra(log_type="ces_send_audio_recv", data={"audio_size": len(audio_chunk)}))
-        base64_mulaw_payload = base64.b64encode(audio_chunk).decode("utf-8")
-        va_input = {"realtimeInput": {"audio": base64_mulaw_payload}}
+        if self.genesys_ws.debug:
+            logger.debug("CESWS: send_audio: Received audio", extra=self._get_log_extra(log_type="ces_send_audio_recv", data={"audio_size": len(audio_chunk)}))
+        if self.inbound_transcoder:
+            audio_chunk = self.inbound_transcoder.convert(audio_chunk)
+        if self.silence_gate:
+            audio_chunk = self.silence_gate.process(audio_chunk)
+            if not self.silence_gate.silence:
+                self.awaiting_reply = True
+            if audio_chunk is None:
+                if not self.inbound_pending:
+                    return
+                # The caller stopped speaking; send the rest of the window now.
+                audio_chunk = b""
+        if self.pre_connect_audio is not None:
+            self._buffer_pre_connect_audio(audio_chunk)
+            return
+        if self.inbound_pending is not None:
+            audio_chunk = self._coalesce(audio_chunk)
+            if audio_chunk is None:
+                return
+        base64_payload = base64.b64encode(audio_chunk).decode("utf-8")
+        va_input = {"realtimeInput": {"audio": base64_payload}}
         if self.is_connected():
             try:
-                await self.websocket.send(json.dumps(va_input))
+                await self._send(json.dumps(va_input))
             except Exception as e:
                 logger.error("Error sending audio to CES", exc_info=True, extra=self._get_log_extra(log_type="ces_send_audio_error"))
+                if self.breaker:
+                    self.breaker.record_failure()
                 # Not re-raising here, as audio send failures are less critical than config messages
                 await self.genesys_ws.send_disconnect("error", info=f"CES Send Audio Error: {e}")
 
@@ -186,7 +420,7 @@ class CESWS:
         logger.info("CES WS connected state", extra=self._get_log_extra(log_type="ces_send_dtmf", data={"connected": connected}))
         if connected:
             try:
-                await self.websocket.send(json.dumps(dtmf_message))
+                await self._send(json.dumps(dtmf_message))
                 logger.info("Sent DTMF to CES", extra=self._get_log_extra(log_type="ces_send_dtmf", data={"digit": redact_value(digit)}))
             except websockets.exceptions.ConnectionClosedError as exc:
                 logger.warning("Failed to send DTMF, CES connection closed", extra=self._get_log_extra(log_type="ces_send_dtmf_closed", data={"digit": redact_value(digit), "error": str(exc)}))
@@ -210,25 +444,69 @@ class CESWS:
             logger.warning("Cannot send DTMF, CES WS not connected", extra=self._get_log_extra(log_type="ces_send_dtmf_error", data={"digit": redact_value(digit)}))
 
     async def send_genesys_disconnect_event(self):
-        logger.info(f"Attempting to send '{DISCONNECT_EVENT_NAME}' event to CES", extra=self._get_log_extra(log_type="ces_send_event"))
+        await self.send_event(DISCONNECT_EVENT_NAME)
+
+    async def send_event(self, event_name):
+        logger.info(f"Attempting to send '{event_name}' event to CES", extra=self._get_log_extra(log_type="ces_send_event"))
         event_message = {
             "realtimeInput": {
                 "event": {
-                    "event": DISCONNECT_EVENT_NAME
+                    "event": event_name
                 }
             }
         }
         if self.is_connected():
             try:
-                await self.websocket.send(json.dumps(event_message))
-                logger.info(f"Sent '{DISCONNECT_EVENT_NAME}' event to CES", extra=self._get_log_extra(log_type="ces_send_event_success", data=event_message))
+                await self._send(json.dumps(event_message))
+                logger.info(f"Sent '{event_name}' event to CES", extra=self._get_log_extra(log_type="ces_send_event_success", data=event_message))
             except Exception as e:
-                logger.error(f"Error sending '{DISCONNECT_EVENT_NAME}' event to CES", exc_info=True, extra=self._get_log_extra(log_type="ces_send_event_error"))
+                logger.error(f"Error sending '{event_name}' event to CES", exc_info=True, extra=self._get_log_extra(log_type="ces_send_event_error"))
         else:
             logger.warning("Cannot send event, CES WS not connected", extra=self._get_log_extra(log_type="ces_send_event_skip"))
 
+    def start_setup_prompt(self):
+        """Starts the pacer ahead of the CES connection to play the setup prompt."""
+        self._create_audio_resources()
+        self.play_prompt(self.setup_prompt)
+        self.pacer_task = asyncio.create_task(self.pacer())
+
+    def play_prompt(self, prompt):
+        """Starts playing a cached prompt, unless CES audio is playing."""
+        if prompt is None or self.pacer_send_buffer or self.playout_clock.playing:
+            return
+        self.prompt = prompt
+        self.prompt_sent = 0
+        self.prompt_started = None
+        metrics.increment("prompts_played")
+        logger.info("Playing cached prompt to Genesys", extra=self._get_log_extra(log_type="ces_prompt_start", data={"prompt_bytes": len(prompt)}))
+
+    def cancel_prompt(self):
+        if self.prompt is not None:
+            self.prompt = None
+            metrics.increment("prompts_cancelled")
+
+    async def _send_prompt(self, now):
+        # Prompts are sent just in time rather than with the pacer's lead,
+        # so that little of a cancelled prompt is left queued in Genesys.
+        if self.prompt_started is None:
+            self.prompt_started = now
+        due = int((now - self.prompt_started + PROMPT_LEAD) * self.genesys_bytes_per_second) - self.prompt_sent
+        due -= due % self.genesys_sample_width
+        if due <= 0:
+            return
+        chunk = bytes(self.prompt[self.prompt_sent:self.prompt_sent + due])
+        if self.genesys_ws.capture:
+            self.genesys_ws.capture.record(capture.GENESYS_OUT, chunk)
+        self.genesys_ws.sent_bytes += len(chunk)
+        await genesys_leg.send(self.genesys_ws.websocket, chunk)
+        self.prompt_sent += len(chunk)
+        if self.prompt is not None and self.prompt_sent >= len(self.prompt):
+            self.prompt = None
+
     async def stop_audio(self):
         logger.info("Stopping audio pacer and clearing queues", extra=self._get_log_extra(log_type="ces_pacer_stop"))
+        if self.audio_out_queue is None:
+            return
         self._stop_pacer_event.set()
         if self.pacer_task:
             self.pacer_task.cancel()
@@ -243,42 +521,22 @@ class CESWS:
         # Clear the pacer send buffer
         self.pacer_send_buffer.clear()
 
-        # Clear any remaining items in the OUTBOUND queue (CES to Genesys)
-        cleared_outbound_count = 0
-        while not self.audio_out_queue.empty():
-            try:
-                self.audio_out_queue.get_nowait()
-                self.audio_out_queue.task_done()
-                cleared_outbound_count += 1
-            except asyncio.QueueEmpty:
-                break
-            except ValueError:
-                break
+        # Drop the OUTBOUND queue (CES to Genesys) at once rather than
+        # draining it item by item; the pacer that read it is stopped.
+        cleared_outbound_count = self.audio_out_queue.qsize()
+        self.audio_out_queue = asyncio.Queue()
         if cleared_outbound_count > 0:
             logger.info(f"Audio OUTBOUND queue cleared: discarded {cleared_outbound_count} chunks", extra=self._get_log_extra(log_type="ces_pacer_stop", data={"cleared_count": cleared_outbound_count}))
         else:
             logger.info("Audio OUTBOUND queue is empty", extra=self._get_log_extra(log_type="ces_pacer_stop"))
 
-        # Clear any remaining items in the INBOUND queue (Genesys to CES)
-        cleared_inbound_count = 0
-        while not self.audio_in_queue.empty():
-            try:
-                self.audio_in_queue.get_nowait()
-                self.audio_in_queue.task_done()
-                cleared_inbound_count += 1
-            except asyncio.QueueEmpty:
-                break
-            except ValueError:
-                pass
-        if cleared_inbound_count > 0:
-            logger.info(f"Audio INBOUND queue cleared: discarded {cleared_inbound_count} chunks", extra=self._get_log_extra(log_type="ces_inbound_queue_clear", data={"cleared_count": cleared_inbound_count}))
-        else:
-            logger.info("Audio INBOUND queue is empty", extra=self._get_log_extra(log_type="ces_inbound_queue_clear"))
-
     async def listen(self):
-        while self.is_connected():
+        cpu = self.genesys_ws.cpu
+        # recv() raises ConnectionClosed once CES closes, which is how a close
+        # between messages is noticed and the session resumed or ended.
+        while True:
             try:
-                if logger.isEnabledFor(logging.DEBUG):
+                if self.genesys_ws.debug:
                     logger.debug("CES WS: Waiting for message...", extra=self._get_log_extra(log_type="ces_recv_wait"))
                 if self.endsession_received:
                     try:
@@ -288,10 +546,22 @@ class CESWS:
                         break
                 else:
                     message = await self.websocket.recv()
-                data = json.loads(message)
+                # Only the handling of a received message is timed, not the wait for it.
+                started_ns = time.thread_time_ns() if cpu.sampled(sessions.LISTEN) else None
+                self.last_received_at = time.monotonic()
+                ces_leg.received(message)
+                if self.genesys_ws.capture:
+                    self.genesys_ws.capture.record(capture.CES_IN, message)
+                if offload.should_offload(offload.CES, len(message)):
+                    started_ns = None  # The worker's time is not this thread's.
+                    data, log_data = await offload.decode(offload.CES, message)
+                else:
+                    # Log extras are redacted when they are built.
+                    data = log_data = offload_worker.decode_ces_message(message)
 
                 if "interruptionSignal" in data:
                     logger.info("Received InterruptionSignal from CES", extra=self._get_log_extra(log_type="ces_recv_interruption"))
+                    self.cancel_prompt()
                     # Clear the audio out queue
                     cleared_outbound_count = 0
                     while not self.audio_out_queue.empty():
@@ -307,6 +577,7 @@ class CESWS:
                     # Clear the pacer send buffer
                     cleared_buffer_size = len(self.pacer_send_buffer)
                     self.pacer_send_buffer.clear()
+                    self.playout_clock.reset()
                     
                     logger.info(
                         "Cleared audio output queue and pacer buffer due to InterruptionSignal",
@@ -320,11 +591,17 @@ class CESWS:
                     )
 
                 elif "sessionOutput" in data and "audio" in data["sessionOutput"]:
-                    # Audio from CES is now 8kHz MULAW
-                    mulaw_audio = base64.b64decode(data["sessionOutput"]["audio"])
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug("CESWS: listen: Received MULAW audio", extra=self._get_log_extra(log_type="ces_recv_audio", data={"audio_size": len(mulaw_audio)}))
-                    await self.audio_out_queue.put(mulaw_audio)
+                    # Audio from CES is in the configured CES encoding; the
+                    # pacer expects the negotiated Genesys format.
+                    ces_audio = data["sessionOutput"]["audio"]
+                    self.cancel_prompt()
+                    self.awaiting_reply = False
+                    if self.genesys_ws.debug:
+                        logger.debug("CESWS: listen: Received audio", extra=self._get_log_extra(log_type="ces_recv_audio", data={"audio_size": len(ces_audio)}))
+                    if self.outbound_transcoder:
+                        ces_audio = bytes(self.outbound_transcoder.convert(ces_audio))
+                    self.playout_clock.on_arrival(asyncio.get_running_loop().time(), len(ces_audio))
+                    await self.audio_out_queue.put(ces_audio)
 
                 elif "sessionOutput" in data and "text" in data["sessionOutput"]:
                     text = data['sessionOutput']['text']
@@ -332,7 +609,7 @@ class CESWS:
                     logger.info("Received text from CES", extra=self._get_log_extra(log_type="ces_recv_text", data={"text": redacted_text}))
 
                 elif "endSession" in data:
-                    logger.info("Received endSession from CES", extra=self._get_log_extra(log_type="ces_recv_endsession", data={"data": data}))
+                    logger.info("Received endSession from CES", extra=self._get_log_extra(log_type="ces_recv_endsession", data={"data": log_data}))
                     self.endsession_received = True
                     metadata = data.get("endSession", {}).get("metadata", {})
                     params = metadata.get("params")
@@ -346,15 +623,20 @@ class CESWS:
                     pass
 
                 elif "sessionOutput" in data:
-                    logger.info("Received sessionOutput from CES", extra=self._get_log_extra(log_type="ces_recv_sessionoutput", data={"data": redact(data)}))
+                    logger.info("Received sessionOutput from CES", extra=self._get_log_extra(log_type="ces_recv_sessionoutput", data={"data": log_data}))
 
                 else:
-                    logger.warning("Received unhandled message from CES", extra=self._get_log_extra(log_type="ces_recv_unhandled", data={"data": redact(data)}))
+                    logger.warning("Received unhandled message from CES", extra=self._get_log_extra(log_type="ces_recv_unhandled", data={"data": log_data}))
+
+                if started_ns is not None:
+                    cpu.add(sessions.LISTEN, started_ns)
             except websockets.exceptions.ConnectionClosed as e:
-                if self.genesys_ws.disconnect_initiated:
-                    logger.info("CES WS connection closed cleanly during teardown", extra=self._get_log_extra(log_type="ces_connection_closed", data={"code": e.code, "reason": e.reason, "exc": str(e)}))
+                if self.genesys_ws.disconnect_initiated or self.closing or self.endsession_received:
+                    logger.info("CES WS connection closed cleanly", extra=self._get_log_extra(log_type="ces_connection_closed", data={"code": e.code, "reason": e.reason, "exc": str(e)}))
                 else:
                     logger.warning("CES WS connection closed unexpectedly", extra=self._get_log_extra(log_type="ces_connection_closed", data={"code": e.code, "reason": e.reason, "exc": str(e)}))
+                    if config.CES_RESUME_ENABLED and await self.resume():
+                        continue
                     await self.genesys_ws.send_disconnect("error", info=f"CES WS Closed: {e.code}")
                 self.genesys_ws.ces_data_received.set()
                 break
@@ -379,15 +661,14 @@ class CESWS:
 
     async def pacer(self):
         logger.info("Starting audio pacer for Genesys", extra=self._get_log_extra(log_type="ces_pacer_start"))
-        MIN_INTERVAL = 0.28  # Seconds (280ms)
         MAX_GENESYS_CHUNK_SIZE = 16000  # Safety cap (64KB is protocol limit)
-        TARGET_SAFETY_BUFFER_MS = 500   # Buffer in Genesys to prevent starvation/jitter
-        PRIME_SIZE = int(TARGET_SAFETY_BUFFER_MS / 1000 * 8000)  # 4000 Bytes (500ms)
         QUEUE_GET_TIMEOUT = 0.05 # Smaller timeout to react faster
 
+        clock = self.playout_clock
+        cpu = self.genesys_ws.cpu
+        loop = asyncio.get_running_loop()
         self.pacer_send_buffer.clear()
-        last_send_time = asyncio.get_event_loop().time()
-        primed = False
+        last_send_time = loop.time()
 
         try:
             while not self._stop_pacer_event.is_set():
@@ -399,7 +680,7 @@ class CESWS:
                     audio_chunk = await asyncio.wait_for(self.audio_out_queue.get(), timeout=QUEUE_GET_TIMEOUT)
                     if audio_chunk:
                         self.pacer_send_buffer.extend(audio_chunk)
-                        if logger.isEnabledFor(logging.DEBUG):
+                        if self.genesys_ws.debug:
                             logger.debug("Pacer added to buffer", extra=self._get_log_extra(log_type="ces_pacer_buffer", data={"buffer_size": len(self.pacer_send_buffer)}))
                 except asyncio.TimeoutError:
                     pass  # No new audio, just check if we need to send
@@ -410,35 +691,75 @@ class CESWS:
                         except ValueError:
                             pass # Queue might be cleared on stop
 
-                current_time = asyncio.get_event_loop().time()
-                time_since_last_send = current_time - last_send_time
-
-                if self.pacer_send_buffer and time_since_last_send >= MIN_INTERVAL:
+                current_time = loop.time()
+
+                if self.genesys_ws.paused:
+                    # Genesys discards audio while paused, so CES audio is
+                    # held and played from a fresh start once resumed.
+                    if clock.playing:
+                        clock.reset()
+                    self.cancel_prompt()
+                    continue
+
+                if (
+                    self.awaiting_reply
+                    and self.waiting_prompt is not None
+                    and self.silence_gate
+                    and self.silence_gate.silence * 1000 >= config.WAITING_PROMPT_AFTER_MS
+                ):
+                    self.awaiting_reply = False
+                    self.play_prompt(self.waiting_prompt)
+
+                if self.prompt is not None:
+                    await self._send_prompt(current_time)
+                    continue
+
+                if clock.playing and not self.pacer_send_buffer and clock.drained(current_time):
+                    logger.info("Pacer buffer became empty, resetting primed state", extra=self._get_log_extra(log_type="ces_pacer_empty"))
+                    clock.stop(current_time)
+
+                if self.pacer_send_buffer and (not clock.playing or current_time - last_send_time >= clock.interval):
                     if not self.genesys_ws.websocket or self.genesys_ws.websocket.state == self.websocket.protocol.state.CLOSED:
                         logger.warning("Genesys WS closed, clearing send buffer", extra=self._get_log_extra(log_type="ces_pacer_discard"))
                         self.pacer_send_buffer.clear()
-                        primed = False
+                        clock.reset()
                         continue
 
-                    if not primed:
-                        # Prime the Genesys buffer with a safety cushion to prevent jitter
-                        chunk_size = min(PRIME_SIZE, len(self.pacer_send_buffer))
-                        primed = True
-                        logger.info("Pacer priming Genesys buffer", extra=self._get_log_extra(log_type="ces_pacer_prime", data={"chunk_size": chunk_size}))
+                    if not clock.playing:
+                        if not clock.ready(current_time, len(self.pacer_send_buffer)):
+                            continue
+                        # Prime the Genesys buffer with one interval plus the current lead
+                        underruns = clock.underruns
+                        clock.start(current_time)
+                        if clock.underruns != underruns:
+                            logger.warning("Pacer underrun: CES audio arrived after Genesys ran out", extra=self._get_log_extra(log_type="ces_pacer_underrun", data={"lead_ms": round(clock.lead * 1000), "jitter_ms": round(clock.jitter * 1000)}))
+                        logger.info("Pacer priming Genesys buffer", extra=self._get_log_extra(log_type="ces_pacer_prime", data={"lead_ms": round(clock.lead * 1000)}))
+                        drift = None
                     else:
-                        # Send exactly the amount of audio that should have played since last send
-                        bytes_to_send = int(time_since_last_send * 8000)
-                        chunk_size = min(bytes_to_send, len(self.pacer_send_buffer))
-                        chunk_size = min(chunk_size, MAX_GENESYS_CHUNK_SIZE)
+                        # Late wakeups are made up by the sample clock, not lost.
+                        drift = current_time - last_send_time - clock.interval
+
+                    chunk_size = min(clock.pending(current_time), len(self.pacer_send_buffer), MAX_GENESYS_CHUNK_SIZE)
+                    # Never split a sample across two frames.
+                    chunk_size -= chunk_size % self.genesys_sample_width
 
                     if chunk_size > 0:
+                        started_ns = time.thread_time_ns() if cpu.sampled(sessions.PACER) else None
                         chunk_to_send = bytes(self.pacer_send_buffer[:chunk_size])
                         try:
-                            await self.genesys_ws.websocket.send(chunk_to_send)
-                            if logger.isEnabledFor(logging.DEBUG):
+                            if self.genesys_ws.capture:
+                                self.genesys_ws.capture.record(capture.GENESYS_OUT, chunk_to_send)
+                            self.genesys_ws.sent_bytes += chunk_size
+                            await genesys_leg.send(self.genesys_ws.websocket, chunk_to_send)
+                            if self.genesys_ws.debug:
                                 logger.debug("Pacer sent to Genesys", extra=self._get_log_extra(log_type="ces_pacer_send", data={"audio_size": len(chunk_to_send)}))
-                            self.pacer_send_buffer = self.pacer_send_buffer[chunk_size:]
+                            del self.pacer_send_buffer[:chunk_size]
+                            clock.on_sent(chunk_size)
                             last_send_time = current_time
+                            if drift is not None:
+                                metrics.observe("pacer_drift_ms", drift * 1000)
+                            if started_ns is not None:
+                                cpu.add(sessions.PACER, started_ns)
                         except websockets.exceptions.ConnectionClosed:
                             logger.warning("Genesys WS closed during send", extra=self._get_log_extra(log_type="ces_pacer_send_error"))
                             break
@@ -446,9 +767,6 @@ class CESWS:
                             logger.error("Error sending audio to Genesys", extra=self._get_log_extra(log_type="ces_pacer_send_error"), exc_info=True)
                             break
                 elif not self.pacer_send_buffer:
-                    if primed:
-                        logger.info("Pacer buffer became empty, resetting primed state", extra=self._get_log_extra(log_type="ces_pacer_empty"))
-                        primed = False
                     await asyncio.sleep(0.01) # Prevent busy loop when idle
 
         except asyncio.CancelledError:
@@ -465,6 +783,7 @@ class CESWS:
 
     async def close(self):
         """Closes the WebSocket connection to CES."""
+        self.closing = True
         if self.is_connected():
             logger.info("Closing WebSocket connection to CES", extra=self._get_log_extra(log_type="ces_close"))
             await self.websocket.close()
@@ -0,0 +1,114 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-location circuit breakers that fail new calls fast while CES is down."""
+
+import logging
+import time
+
+from . import config, metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    While closed, every call is allowed. After `failure_threshold`
+    consecutive failures the breaker opens and calls are rejected until
+    `reset_timeout` seconds have passed. It then half-opens and lets up to
+    `probes` calls through: a success closes it, a failure opens it again.
+    A probe that never reports back is given up on after another
+    `reset_timeout`, so the breaker cannot get stuck half-open.
+    """
+
+    __slots__ = ("name", "failure_threshold", "reset_timeout", "probes", "state", "failures", "_opened_at", "_probes_in_flight", "_probe_started_at")
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, probes: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_started_at = 0.0
+
+    def allow(self, now: float = None) -> bool:
+        """Returns True if a call may proceed, and counts it if it is a probe."""
+        if self.state == CLOSED or self.failure_threshold <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN:
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            self._transition(HALF_OPEN)
+            self._probes_in_flight = 0
+        if self._probes_in_flight >= self.probes:
+            if now - self._probe_started_at < self.reset_timeout:
+                return False
+            self._probes_in_flight = 0  # The earlier probes never reported back.
+        self._probes_in_flight += 1
+        self._probe_started_at = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self, now: float = None):
+        self.failures += 1
+        if self.failure_threshold <= 0:
+            return
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self._opened_at = time.monotonic() if now is None else now
+            self._transition(OPEN)
+
+    def _transition(self, state):
+        logger.warning("CES circuit breaker changed state", extra={"log_type": "circuit_breaker", "location": self.name, "from_state": self.state, "to_state": state, "failures": self.failures})
+        metrics.increment(f"circuit_breaker_{state}")
+        self.state = state
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+_breakers = {}
+
+
+def get(location: str) -> CircuitBreaker:
+    """Returns the circuit breaker for a CES location, creating it if needed."""
+    breaker = _breakers.get(location)
+    if breaker is None:
+        breaker = _breakers[location] = CircuitBreaker(
+            location,
+            failure_threshold=config.CIRCUIT_BREAKER_FAILURES,
+            reset_timeout=config.CIRCUIT_BREAKER_RESET_MS / 1000,
+            probes=config.CIRCUIT_BREAKER_PROBES,
+        )
+    return breaker
+
+
+def not_closed() -> dict:
+    """Returns the states of the breakers that are currently not closed."""
+    return {name: breaker.state for name, breaker in _breakers.items() if breaker.state != CLOSED}
+
+
+metrics.register_provider("circuit_breakers", lambda: {name: breaker.snapshot() for name, breaker in _breakers.items()})
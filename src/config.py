@@ -14,20 +14,39 @@
 
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from google.cloud import secretmanager
 
 load_dotenv()
 
+_secret_client = None
+_secret_client_lock = threading.Lock()
+
+
+def get_secret_manager_client():
+    """Returns the shared Secret Manager client, importing the library on first use."""
+    global _secret_client
+    with _secret_client_lock:
+        if _secret_client is None:
+            from google.cloud import secretmanager
+            _secret_client = secretmanager.SecretManagerServiceClient()
+        return _secret_client
+
+
+def _is_secret_path(secret_value) -> bool:
+    return isinstance(secret_value, str) and secret_value.startswith("projects/")
+
+
 def resolve_secret(secret_value: str) -> str:
     if not secret_value:
         return secret_value
-    if isinstance(secret_value, str) and secret_value.startswith("projects/"):
+    if _is_secret_path(secret_value):
         secret_path = secret_value
         if "/versions/" not in secret_path:
             secret_path = f"{secret_path}/versions/latest"
         try:
-            client = secretmanager.SecretManagerServiceClient()
+            client = get_secret_manager_client()
             response = client.access_secret_version(name=secret_path)
             return response.payload.data.decode("UTF-8").strip()
         except Exception as e:
@@ -35,11 +54,160 @@ def resolve_secret(secret_value: str) -> str:
             raise
     return secret_value
 
+
+def resolve_secrets(*secret_values: str) -> list:
+    """Resolves several secrets, fetching those in Secret Manager concurrently."""
+    if sum(1 for value in secret_values if _is_secret_path(value)) < 2:
+        return [resolve_secret(value) for value in secret_values]
+    # Create the client once up front so the worker threads share it.
+    get_secret_manager_client()
+    with ThreadPoolExecutor(max_workers=len(secret_values)) as pool:
+        return list(pool.map(resolve_secret, secret_values))
+
 PORT = os.getenv("PORT", 8080)
-GENESYS_API_KEY = resolve_secret(os.getenv("GENESYS_API_KEY"))
+GENESYS_API_KEY, GENESYS_CLIENT_SECRET = resolve_secrets(
+    os.getenv("GENESYS_API_KEY"), os.getenv("GENESYS_CLIENT_SECRET")
+)
 AUTH_TOKEN_SECRET_PATH = os.getenv("AUTH_TOKEN_SECRET_PATH")
-GENESYS_CLIENT_SECRET = resolve_secret(os.getenv("GENESYS_CLIENT_SECRET"))
 LOG_UNREDACTED_DATA = os.getenv("LOG_UNREDACTED_DATA")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 DEBUG_WEBSOCKETS = os.getenv("DEBUG_WEBSOCKETS", "false") == 'true'
-DISCONNECT_EVENT_NAME = os.getenv("DISCONNECT_EVENT_NAME", "sys.remote-call-disconnected")
\ No newline at end of file
+
+# Comma-separated Genesys conversation IDs and CES agent IDs whose calls are
+# logged at DEBUG, including their WebSocket frames, whatever the LOG_LEVEL.
+# The list can also be changed at runtime through /admin/debug.
+DEBUG_CONVERSATION_IDS = [i.strip() for i in os.getenv("DEBUG_CONVERSATION_IDS", "").split(",") if i.strip()]
+DEBUG_AGENT_IDS = [i.strip() for i in os.getenv("DEBUG_AGENT_IDS", "").split(",") if i.strip()]
+DISCONNECT_EVENT_NAME = os.getenv("DISCONNECT_EVENT_NAME", "sys.remote-call-disconnected")
+
+# Events sent to CES when Genesys pauses and resumes the audio stream, for
+# example while the call is on hold. Leave empty to not notify CES.
+PAUSE_EVENT_NAME = os.getenv("PAUSE_EVENT_NAME", "")
+RESUME_EVENT_NAME = os.getenv("RESUME_EVENT_NAME", "")
+
+# Rate limiting of failed WebSocket upgrade attempts. Set the burst to 0 to disable.
+AUTH_RATE_LIMIT_BURST = int(os.getenv("AUTH_RATE_LIMIT_BURST", "10"))
+AUTH_RATE_LIMIT_PER_SEC = float(os.getenv("AUTH_RATE_LIMIT_PER_SEC", "0.2"))
+AUTH_RATE_LIMIT_TTL = float(os.getenv("AUTH_RATE_LIMIT_TTL", "300"))
+AUTH_RATE_LIMIT_XFF_DEPTH = int(os.getenv("AUTH_RATE_LIMIT_XFF_DEPTH", "1"))
+AUTH_RATE_LIMIT_BY_ADDRESS = os.getenv("AUTH_RATE_LIMIT_BY_ADDRESS", "false") == 'true'
+
+# Seconds to spend warming up (token prefetch, DNS) before reporting ready.
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))
+
+# Event loop implementation ("asyncio" or "uvloop") and WebSocket transport
+# profile (see src/transport.py).
+EVENT_LOOP = os.getenv("EVENT_LOOP", "asyncio")
+TRANSPORT_PROFILE = os.getenv("TRANSPORT_PROFILE", "default")
+
+# permessage-deflate policy per WebSocket leg: "deflate" or "none".
+GENESYS_WS_COMPRESSION = os.getenv("GENESYS_WS_COMPRESSION", "none")
+CES_WS_COMPRESSION = os.getenv("CES_WS_COMPRESSION", "deflate")
+
+# Accepted Genesys media formats, most preferred first, and the audio
+# encoding and sample rate requested from CES. Audio is transcoded between
+# the two when they differ.
+GENESYS_MEDIA_FORMATS = [f.strip() for f in os.getenv("GENESYS_MEDIA_FORMATS", "PCMU").split(",") if f.strip()]
+CES_AUDIO_ENCODING = os.getenv("CES_AUDIO_ENCODING", "MULAW")
+CES_SAMPLE_RATE = int(os.getenv("CES_SAMPLE_RATE", "8000"))
+
+# Optional energy-based gating of silent inbound audio. The threshold is an
+# RMS level on the 16-bit linear scale; durations are in milliseconds.
+VAD_ENABLED = os.getenv("VAD_ENABLED", "false") == 'true'
+VAD_THRESHOLD = int(os.getenv("VAD_THRESHOLD", "300"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "400"))
+VAD_PRE_ROLL_MS = int(os.getenv("VAD_PRE_ROLL_MS", "200"))
+VAD_KEEPALIVE_MS = int(os.getenv("VAD_KEEPALIVE_MS", "1000"))
+
+# Caller audio is sent to CES in messages of at least this many
+# milliseconds. Fewer, larger messages cost less CPU on both sides but add
+# up to the window to the latency of caller speech. 0 sends every frame.
+INBOUND_COALESCE_MS = int(os.getenv("INBOUND_COALESCE_MS", "0"))
+
+# Pacing of CES audio to Genesys. Audio is sent every interval, keeping
+# Genesys one interval plus an adaptive lead ahead of real time. The lead
+# starts at the initial value and adapts between the bounds.
+PACER_INTERVAL_MS = int(os.getenv("PACER_INTERVAL_MS", "280"))
+PACER_INITIAL_LEAD_MS = int(os.getenv("PACER_INITIAL_LEAD_MS", "220"))
+PACER_MIN_LEAD_MS = int(os.getenv("PACER_MIN_LEAD_MS", "40"))
+PACER_MAX_LEAD_MS = int(os.getenv("PACER_MAX_LEAD_MS", "1000"))
+
+# Cached prompts played by the pacer while CES is silent, as headerless
+# 8 kHz mu-law files. The setup prompt plays while CES connects, with
+# pipelined setup. The waiting prompt plays once the caller has finished
+# speaking and CES has not answered for the given number of milliseconds,
+# and needs VAD to tell when the caller stopped. Both stop as soon as CES
+# audio or an interruption arrives.
+SETUP_PROMPT_FILE = os.getenv("SETUP_PROMPT_FILE", "")
+WAITING_PROMPT_FILE = os.getenv("WAITING_PROMPT_FILE", "")
+WAITING_PROMPT_AFTER_MS = int(os.getenv("WAITING_PROMPT_AFTER_MS", "3000"))
+
+# Pipelined call setup: answer Genesys `opened` as soon as the `open` message
+# is validated and connect to CES in the background. Caller audio received
+# meanwhile is buffered, up to the given number of milliseconds.
+PIPELINED_SETUP = os.getenv("PIPELINED_SETUP", "false") == 'true'
+PRE_CONNECT_BUFFER_MS = int(os.getenv("PRE_CONNECT_BUFFER_MS", "2000"))
+
+# CES connection establishment. The deadline bounds the whole connect,
+# including retries. A second, hedged handshake is started when the first
+# has taken longer than the given percentile of recent handshakes, or the
+# initial hedge delay until enough have been seen. Set the percentile to 0
+# to disable hedging.
+CES_CONNECT_DEADLINE_MS = int(os.getenv("CES_CONNECT_DEADLINE_MS", "10000"))
+CES_CONNECT_RETRIES = int(os.getenv("CES_CONNECT_RETRIES", "2"))
+CES_CONNECT_BACKOFF_MS = int(os.getenv("CES_CONNECT_BACKOFF_MS", "200"))
+CES_HEDGE_PERCENTILE = float(os.getenv("CES_HEDGE_PERCENTILE", "95"))
+CES_HEDGE_DELAY_MS = int(os.getenv("CES_HEDGE_DELAY_MS", "1000"))
+
+# Per-location circuit breaker around CES connects, token fetches and CES
+# send errors. It opens after the given number of consecutive failures and
+# lets probe calls through again after the reset timeout. Set the failure
+# threshold to 0 to disable it.
+CIRCUIT_BREAKER_FAILURES = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+CIRCUIT_BREAKER_RESET_MS = int(os.getenv("CIRCUIT_BREAKER_RESET_MS", "10000"))
+CIRCUIT_BREAKER_PROBES = int(os.getenv("CIRCUIT_BREAKER_PROBES", "1"))
+
+# Optional CES front ends to choose between, as comma-separated
+# `location=url` pairs; a location may be listed more than once. Calls for
+# a location without entries use the default global endpoint. Set the probe
+# interval above 0 to measure each endpoint in the background as well.
+CES_ENDPOINTS = [tuple(entry.strip().split("=", 1)) for entry in os.getenv("CES_ENDPOINTS", "").split(",") if "=" in entry]
+CES_ENDPOINT_PROBE_INTERVAL_MS = int(os.getenv("CES_ENDPOINT_PROBE_INTERVAL_MS", "0"))
+
+# Resume mode: when the CES connection drops unexpectedly, reconnect and
+# re-send the config for the same session within the budget instead of
+# ending the call. Caller audio is held meanwhile, up to
+# PRE_CONNECT_BUFFER_MS.
+CES_RESUME_ENABLED = os.getenv("CES_RESUME_ENABLED", "false") == 'true'
+CES_RESUME_BUDGET_MS = int(os.getenv("CES_RESUME_BUDGET_MS", "800"))
+CES_RESUME_MAX_ATTEMPTS = int(os.getenv("CES_RESUME_MAX_ATTEMPTS", "3"))
+
+# Directory to write per-session capture files to (see src/capture.py).
+# Capture is disabled when unset.
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "")
+
+# Key required in the `x-admin-key` header for the /admin/ endpoints. The
+# endpoints are disabled when unset.
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+ADMIN_PROFILE_MAX_SECONDS = float(os.getenv("ADMIN_PROFILE_MAX_SECONDS", "30"))
+
+# Messages of at least this many bytes are decoded (JSON, base64 audio and
+# log redaction) in a pool of worker processes instead of on the event
+# loop. Set to 0 to decode everything inline.
+OFFLOAD_MESSAGE_BYTES = int(os.getenv("OFFLOAD_MESSAGE_BYTES", "0"))
+OFFLOAD_WORKERS = int(os.getenv("OFFLOAD_WORKERS", "2"))
+
+# Watchdog: sessions that receive nothing from Genesys, or nothing from a
+# connected CES (outside of pauses), for the idle timeout, and calls longer
+# than the maximum duration, are disconnected. Set a limit to 0 to disable it.
+GENESYS_IDLE_TIMEOUT_MS = int(os.getenv("GENESYS_IDLE_TIMEOUT_MS", "60000"))
+CES_IDLE_TIMEOUT_MS = int(os.getenv("CES_IDLE_TIMEOUT_MS", "300000"))
+MAX_CALL_DURATION_MS = int(os.getenv("MAX_CALL_DURATION_MS", "14400000"))
+WATCHDOG_INTERVAL_MS = int(os.getenv("WATCHDOG_INTERVAL_MS", "5000"))
+
+# Teardown deadlines: how long a Genesys `close` waits for CES to finish the
+# session, and how long the closing handshake of each WebSocket may take
+# before the connection is dropped.
+CLOSE_WAIT_TIMEOUT_MS = int(os.getenv("CLOSE_WAIT_TIMEOUT_MS", "2000"))
+CES_CLOSE_TIMEOUT_MS = int(os.getenv("CES_CLOSE_TIMEOUT_MS", "1000"))
+GENESYS_CLOSE_TIMEOUT_MS = int(os.getenv("GENESYS_CLOSE_TIMEOUT_MS", "2000"))
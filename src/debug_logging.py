@@ -0,0 +1,155 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""DEBUG logging for selected calls, switched at runtime.
+
+LOG_LEVEL applies to the whole process, so debugging one call at DEBUG
+would log every frame of every call. Instead, calls whose conversation ID
+or agent ID is in a filter table, or whose `customConfig` sets `debug`, get
+DEBUG logging on their own. Each session resolves these into its `debug`
+flag, which the per-frame log statements check instead of the logger
+level. While any call may be targeted, the adapter's loggers are lowered
+to DEBUG and a filter on the root handlers drops the DEBUG records of all
+other sessions.
+"""
+
+import logging
+
+from . import config, sessions
+
+_PACKAGE = __package__
+
+_conversation_ids = set(config.DEBUG_CONVERSATION_IDS)
+_agent_ids = set(config.DEBUG_AGENT_IDS)
+_debug_sessions = set()  # adapter_session_id of the targeted live sessions
+
+# Frame logs of targeted sessions' WebSockets, independent of DEBUG_WEBSOCKETS.
+_websockets_logger = logging.getLogger("websockets.session")
+_websockets_logger.setLevel(logging.DEBUG)
+
+
+def process_debug() -> bool:
+    """Returns True if LOG_LEVEL already logs every session at DEBUG."""
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+class _SessionFilter(logging.Filter):
+    def filter(self, record):
+        return (
+            record.levelno > logging.DEBUG
+            or not record.name.startswith(_PACKAGE)
+            or getattr(record, "adapter_session_id", None) in _debug_sessions
+        )
+
+
+_filter = _SessionFilter()
+
+
+def trace_websocket(websocket, adapter_session_id: str, enabled: bool = True):
+    """Turns frame logging of one WebSocket connection on or off."""
+    if websocket is None:
+        return
+    if enabled:
+        websocket.protocol.logger = websocket.logger = logging.LoggerAdapter(
+            _websockets_logger, {"websocket": websocket, "adapter_session_id": adapter_session_id}
+        )
+    websocket.protocol.debug = websocket.debug = enabled or config.DEBUG_WEBSOCKETS
+
+
+def is_targeted(adapter_session_id: str) -> bool:
+    return adapter_session_id in _debug_sessions
+
+
+def update(session):
+    """Sets `session.debug` from the filter table.
+
+    Called once the session's conversation and agent IDs are known, and for
+    every live session when the table changes.
+    """
+    targeted = (
+        session.conversation_id in _conversation_ids
+        or session.agent_id in _agent_ids
+        or (session.ces_ws is not None and session.ces_ws.settings.debug)
+    )
+    if targeted == (session.adapter_session_id in _debug_sessions):
+        return
+    if targeted:
+        _debug_sessions.add(session.adapter_session_id)
+    else:
+        _debug_sessions.discard(session.adapter_session_id)
+    _refresh()
+    session.debug = targeted or process_debug()
+    trace_websocket(session.websocket, session.adapter_session_id, targeted)
+    if session.ces_ws:
+        trace_websocket(session.ces_ws.websocket, session.adapter_session_id, targeted)
+
+
+def forget(session):
+    if session.adapter_session_id in _debug_sessions:
+        _debug_sessions.discard(session.adapter_session_id)
+        _refresh()
+
+
+def _refresh():
+    # With LOG_LEVEL=DEBUG every session already logs at DEBUG.
+    if process_debug():
+        return
+    root = logging.getLogger()
+    if _conversation_ids or _agent_ids or _debug_sessions:
+        logging.getLogger(_PACKAGE).setLevel(logging.DEBUG)
+        for handler in root.handlers:
+            handler.addFilter(_filter)
+    else:
+        logging.getLogger(_PACKAGE).setLevel(logging.NOTSET)
+        for handler in root.handlers:
+            handler.removeFilter(_filter)
+
+
+def _apply():
+    _refresh()
+    for session in sessions.active():
+        update(session)
+
+
+def install():
+    """Applies the filter table from the configuration, after logging is set up."""
+    if not process_debug():
+        _apply()
+
+
+def set_targets(add: bool, conversation_ids=(), agent_ids=()):
+    """Adds IDs to, or removes them from, the filter table."""
+    if add:
+        _conversation_ids.update(conversation_ids)
+        _agent_ids.update(agent_ids)
+    else:
+        _conversation_ids.difference_update(conversation_ids)
+        _agent_ids.difference_update(agent_ids)
+    if not process_debug():
+        _apply()
+
+
+def clear():
+    _conversation_ids.clear()
+    _agent_ids.clear()
+    if not process_debug():
+        _apply()
+
+
+def targets() -> dict:
+    return {
+        "conversation_ids": sorted(_conversation_ids),
+        "agent_ids": sorted(_agent_ids),
+        "sessions": sorted(_debug_sessions),
+    }
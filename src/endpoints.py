@@ -0,0 +1,125 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Latency-aware selection between configured CES front ends."""
+
+import asyncio
+import logging
+import time
+import urllib.parse
+
+from . import config, metrics
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the rolling RTT and error rate.
+EWMA_GAIN = 0.2
+
+# A failing endpoint ranks as if its RTT were this many times higher per
+# unit of error rate.
+ERROR_PENALTY = 10
+
+PROBE_TIMEOUT = 5
+
+
+class EndpointStats:
+    """Rolling handshake RTT and error rate of one CES endpoint."""
+
+    __slots__ = ("url", "location", "rtt", "error_rate", "connects")
+
+    def __init__(self, url: str, location: str):
+        self.url = url
+        self.location = location
+        self.rtt = None
+        self.error_rate = 0.0
+        self.connects = 0
+
+    def record_success(self, rtt: float):
+        self.rtt = rtt if self.rtt is None else self.rtt + (rtt - self.rtt) * EWMA_GAIN
+        self.error_rate -= self.error_rate * EWMA_GAIN
+
+    def record_failure(self):
+        self.error_rate += (1 - self.error_rate) * EWMA_GAIN
+
+    def score(self) -> float:
+        # Unmeasured endpoints rank first so that each one gets tried.
+        return (self.rtt or 0.0) * (1 + ERROR_PENALTY * self.error_rate) + self.error_rate
+
+    def snapshot(self) -> dict:
+        return {
+            "location": self.location,
+            "rtt_ms": round(self.rtt * 1000, 1) if self.rtt is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "connects": self.connects,
+        }
+
+
+class EndpointSelector:
+    """Ranks the CES endpoints configured for each location."""
+
+    def __init__(self, endpoints: list[tuple[str, str]]):
+        self._stats = {}
+        self._by_location = {}
+        for location, url in endpoints:
+            stats = self._stats.setdefault(url, EndpointStats(url, location))
+            self._by_location.setdefault(location, []).append(stats)
+
+    def candidates(self, location: str) -> list[str]:
+        """Returns the endpoint URLs for `location`, best first."""
+        ranked = sorted(self._by_location.get(location, ()), key=EndpointStats.score)
+        return [stats.url for stats in ranked]
+
+    def record(self, url: str, rtt: float = None, error: bool = False, probe: bool = False):
+        """Records a handshake (or probe) outcome for `url`, if it is configured."""
+        stats = self._stats.get(url)
+        if stats is None:
+            return
+        if error:
+            stats.record_failure()
+            return
+        stats.record_success(rtt)
+        if not probe:
+            stats.connects += 1
+
+    def hosts(self) -> set[str]:
+        return {urllib.parse.urlsplit(url).hostname for url in self._stats}
+
+    async def _probe(self, url: str):
+        parts = urllib.parse.urlsplit(url)
+        secure = parts.scheme == "wss"
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(PROBE_TIMEOUT):
+                _, writer = await asyncio.open_connection(parts.hostname, parts.port or (443 if secure else 80), ssl=secure or None)
+        except (OSError, TimeoutError) as e:
+            logger.warning("CES endpoint probe failed", extra={"log_type": "ces_endpoint_probe", "url": url, "error": str(e)})
+            self.record(url, error=True, probe=True)
+            return
+        self.record(url, rtt=time.perf_counter() - started, probe=True)
+        writer.close()
+
+    async def probe_forever(self, interval: float):
+        """Measures a TCP (and TLS) connect to every endpoint each interval."""
+        while True:
+            await asyncio.gather(*(self._probe(url) for url in self._stats))
+            metrics.increment("ces_endpoint_probes")
+            await asyncio.sleep(interval)
+
+    def snapshot(self) -> dict:
+        return {url: stats.snapshot() for url, stats in self._stats.items()}
+
+
+selector = EndpointSelector(config.CES_ENDPOINTS)
+
+metrics.register_provider("ces_endpoints", lambda: selector.snapshot())
@@ -15,10 +15,23 @@
 import asyncio
 import json
 import logging
+import time
 import websockets
 
+from . import (
+    audio,
+    call_settings,
+    capture,
+    config,
+    debug_logging,
+    messages,
+    metrics,
+    offload,
+    sessions,
+)
 from .ces_ws import CESWS
 from .redaction import redact, redact_value
+from .transport import genesys_leg
 from websockets.protocol import State
 from .config import LOG_UNREDACTED_DATA, DISCONNECT_EVENT_NAME
 
@@ -26,6 +39,22 @@ logger = logging.getLogger(__name__)
 
 
 class GenesysWS:
+    # Sessions are long-lived and numerous, so attributes are slotted to keep
+    # the fixed per-call memory cost down.
+    __slots__ = (
+        "websocket", "adapter_session_id", "ces_ws",
+        "last_server_sequence_number", "last_client_sequence_number",
+        "client_session_id", "conversation_id", "input_variables",
+        "ces_input_variables", "deployment_id", "agent_id", "initial_message",
+        "session_id", "disconnect_initiated", "is_probe", "ces_data_received",
+        "customer_channel_index", "channel_count", "setup_task",
+        "setup_started", "capture", "started_at", "received_bytes",
+        "sent_bytes", "cpu", "paused", "paused_at", "last_received_at",
+        "teardown_started", "debug",
+    )
+
+    close_wait_timeout = config.CLOSE_WAIT_TIMEOUT_MS / 1000  # Seconds to wait for CES data
+
     def __init__(self, websocket, adapter_session_id):
         self.websocket = websocket
         self.adapter_session_id = adapter_session_id
@@ -35,10 +64,28 @@ class GenesysWS:
         self.client_session_id = None
         self.conversation_id = None
         self.input_variables = None
+        self.ces_input_variables = None
+        self.deployment_id = None
+        self.agent_id = None
+        self.initial_message = None
+        self.session_id = None
         self.disconnect_initiated = False
         self.is_probe = False
         self.ces_data_received = asyncio.Event()
-        self.close_wait_timeout = 2  # Seconds to wait for CES data
+        self.customer_channel_index = 0
+        self.channel_count = 1
+        self.setup_task = None  # Background CES setup in pipelined mode
+        self.setup_started = None
+        self.capture = None  # SessionCapture when CAPTURE_DIR is set
+        self.started_at = time.monotonic()
+        self.received_bytes = 0  # Genesys leg, for the admin session table
+        self.sent_bytes = 0
+        self.cpu = sessions.CpuUsage()
+        self.paused = False
+        self.paused_at = None
+        self.last_received_at = self.started_at  # For the watchdog
+        self.teardown_started = None
+        self.debug = debug_logging.process_debug()  # Per-frame DEBUG logs, see debug_logging
 
     def _get_log_extra(self, log_type: str, data: dict = None):
         extra = {
@@ -56,14 +103,25 @@ class GenesysWS:
 
     async def handle_connection(self):
         self.ces_ws = CESWS(self, self.adapter_session_id)
+        if config.CAPTURE_DIR:
+            self.capture = capture.SessionCapture(self.adapter_session_id)
+        sessions.register(self)
 
         try:
             logger.debug("Genesys WS: Waiting for message...", extra=self._get_log_extra(log_type="genesys_recv_wait"))
             async for message in self.websocket:
-                if isinstance(message, str):
-                    await self.handle_text_message(message)
-                elif isinstance(message, bytes):
-                    await self.handle_binary_message(message)
+                genesys_leg.received(message)
+                self.received_bytes += len(message)
+                self.last_received_at = time.monotonic()
+                if self.capture:
+                    self.capture.record(capture.GENESYS_IN, message)
+                area = sessions.TEXT if isinstance(message, str) else sessions.BINARY
+                if self.cpu.sampled(area):
+                    started_ns = time.thread_time_ns()
+                    await self._dispatch(message)
+                    self.cpu.add(area, started_ns)
+                else:
+                    await self._dispatch(message)
         except websockets.exceptions.ConnectionClosedError as e:
             if self.disconnect_initiated:
                 logger.info("Genesys WebSocket closed as expected after disconnect process started.", extra=self._get_log_extra(log_type="genesys_connection_closed"))
@@ -76,220 +134,305 @@ class GenesysWS:
             if not self.disconnect_initiated:
                  await self.send_disconnect("error", info=f"WebSocket Error: {e}")
         finally:
+            self.log_summary()
             logger.info("Genesys connection loop finished. Cleaning up CES connection.", extra=self._get_log_extra(log_type="genesys_connection_cleanup"))
+            await self.cancel_setup()
             if self.ces_ws:
                 await self.ces_ws.close()
+            if self.capture:
+                self.capture.close()
+            sessions.unregister(self)
+            debug_logging.forget(self)
+            if self.teardown_started is not None:
+                metrics.observe("teardown_ms", (time.perf_counter() - self.teardown_started) * 1000)
+
+    async def _dispatch(self, message):
+        if isinstance(message, str):
+            await self.handle_text_message(message)
+        elif isinstance(message, bytes):
+            await self.handle_binary_message(message)
+
+    def log_summary(self):
+        """Logs the duration, traffic and CPU time of the session."""
+        cpu_ms = self.cpu.total_ms()
+        metrics.observe("session_cpu_ms", cpu_ms)
+        logger.info("Session summary", extra=self._get_log_extra(log_type="session_summary", data={
+            "duration_seconds": round(time.monotonic() - self.started_at, 1),
+            "received_bytes": self.received_bytes,
+            "sent_bytes": self.sent_bytes,
+            "cpu_ms": round(cpu_ms, 1),
+            "cpu_ms_by_handler": self.cpu.by_area_ms(),
+        }))
 
     async def handle_text_message(self, message):
-        redacted_message = redact(message)
-        logger.info("Received text message from Genesys", extra=self._get_log_extra(log_type="genesys_recv", data={"data": redacted_message}))
+        log_data = None
         try:
-            data = json.loads(message)
-            message_type = data.get('type')
-            logger.info("Received Genesys message", extra=self._get_log_extra(log_type="genesys_recv_parsed", data={"message_type": message_type}))
-            self.last_client_sequence_number = data.get("seq")
-            self.client_session_id = data.get("id")
-            message_type = data.get("type")
-            if message_type == "open":
-                parameters = data.get("parameters", {})
-                self.conversation_id = parameters.get("conversationId")
-
-                if self.conversation_id == "00000000-0000-0000-0000-000000000000":
-                    self.is_probe = True
-                    logger.info("Connection Probe detected (Null UUID). Skipping CES connection.", extra=self._get_log_extra(log_type="genesys_probe"))
-
-                self.input_variables = parameters.get("inputVariables")
-
-                self.deployment_id = None
-                self.agent_id = None
-
-                if not self.is_probe:
-                    self.initial_message = None
-                    self.session_id = None
-                    if self.input_variables:
-                        if "_deployment_id" in self.input_variables:
-                            self.deployment_id = self.input_variables["_deployment_id"]
-                            # Extract agent_id from deployment_id
-                            # deployment_id format:
-                            # projects/{project}/locations/{location}/apps/{app_id}/deployments/{deployment_id}
-                            # agent_id format:
-                            # projects/{project}/locations/{location}/apps/{app_id}
-                            parts = self.deployment_id.split("/")
-                            if len(parts) == 8 and parts[6] == "deployments":
-                                self.agent_id = "/".join(parts[:6])
-                            else:
-                                logger.error("Invalid _deployment_id format", extra=self._get_log_extra(log_type="genesys_config_error", data={"deployment_id": self.deployment_id}))
-                                await self.send_disconnect(
-                                    "error", "Invalid _deployment_id format"
-                                )
-                                return
-                        elif "_agent_id" in self.input_variables:
-                            self.agent_id = self.input_variables["_agent_id"]
-                        if "_initial_message" in self.input_variables:
-                            try:
-                              self.initial_message = json.loads(self.input_variables["_initial_message"])
-                            except json.JSONDecodeError:
-                                logger.warning(f"Failed to JSON decode _initial_message: {self.input_variables['_initial_message']}", exc_info=True, extra=self._get_log_extra(log_type="genesys_config_warning"))
-                                self.initial_message = self.input_variables["_initial_message"] # Fallback to using the raw string
-                        if "_session_id" in self.input_variables:
-                            self.session_id = self.input_variables["_session_id"]
-
-                        self.ces_input_variables = {
-                            k: v
-                            for k, v in self.input_variables.items()
-                            if not k.startswith("_")
-                        }
-                        self.ces_input_variables["adapterSessionId"] = self.adapter_session_id
-
-                    if not self.agent_id:
-                        logger.error("Missing _deployment_id or _agent_id", extra=self._get_log_extra(log_type="genesys_config_error", data={"input_variables": self.input_variables}))
+            if offload.should_offload(offload.GENESYS, len(message)):
+                # Waiting for the worker is not CPU time of this session.
+                self.cpu.skip(sessions.TEXT)
+                data, log_data = await offload.decode(offload.GENESYS, message)
+                parsed = messages.from_data(data)
+            else:
+                parsed = messages.parse(message)
+        except ValueError:
+            logger.error("Error decoding JSON from Genesys", extra=self._get_log_extra(log_type="genesys_json_decode_error", data={"message": message}))
+            await self.send_disconnect("error", "Invalid JSON received")
+            return
+
+        # Log extras are redacted copies of the message, so they are only
+        # built when the message is logged.
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Received text message from Genesys", extra=self._get_log_extra(log_type="genesys_recv", data={"data": parsed.data if log_data is None else log_data}))
+            logger.info("Received Genesys message", extra=self._get_log_extra(log_type="genesys_recv_parsed", data={"message_type": parsed.type}))
+        self.last_client_sequence_number = parsed.seq
+        self.client_session_id = parsed.id
+        handler = self._TEXT_HANDLERS.get(parsed.type)
+        if handler is None:
+            logger.info("Received unhandled message type from Genesys", extra=self._get_log_extra(log_type="genesys_recv_unhandled", data={"message_type": parsed.type, "data": parsed.data}))
+            return
+        await handler(self, parsed)
+
+    async def _on_open(self, message):
+        # Setup waits for CES, so it is not a fair CPU sample.
+        self.cpu.skip(sessions.TEXT)
+        self.setup_started = time.perf_counter()
+        self.conversation_id = message.conversation_id
+
+        if self.conversation_id == "00000000-0000-0000-0000-000000000000":
+            self.is_probe = True
+            logger.info("Connection Probe detected (Null UUID). Skipping CES connection.", extra=self._get_log_extra(log_type="genesys_probe"))
+
+        self.input_variables = message.input_variables
+
+        # Applied before CES is connected, as the pacer and audio gating are
+        # created from it.
+        if message.custom_config:
+            self._apply_custom_config(message.custom_config)
+
+        self.deployment_id = None
+        self.agent_id = None
+
+        if not self.is_probe:
+            self.initial_message = None
+            self.session_id = None
+            if self.input_variables:
+                if "_deployment_id" in self.input_variables:
+                    self.deployment_id = self.input_variables["_deployment_id"]
+                    # Extract agent_id from deployment_id
+                    # deployment_id format:
+                    # projects/{project}/locations/{location}/apps/{app_id}/deployments/{deployment_id}
+                    # agent_id format:
+                    # projects/{project}/locations/{location}/apps/{app_id}
+                    parts = self.deployment_id.split("/")
+                    if len(parts) == 8 and parts[6] == "deployments":
+                        self.agent_id = "/".join(parts[:6])
+                    else:
+                        logger.error("Invalid _deployment_id format", extra=self._get_log_extra(log_type="genesys_config_error", data={"deployment_id": self.deployment_id}))
                         await self.send_disconnect(
-                            "error",
-                            "Missing required parameter: _agent_id or _deployment_id",
+                            "error", "Invalid _deployment_id format"
                         )
                         return
-
-                    if not await self.ces_ws.connect(self.agent_id, self.deployment_id, self.initial_message, self.session_id):
-                        logger.error("CES connection failed, stopping setup", extra=self._get_log_extra(log_type="genesys_config_error"))
-                        return # Disconnect is handled within ces_ws.connect
-
-                    try:
-                        self.ces_ws.listen_task = asyncio.create_task(self.ces_ws.listen())
-                        self.ces_ws.pacer_task = asyncio.create_task(self.ces_ws.pacer())
-                    except Exception as e:
-                        logger.error("Error creating CES listener or pacer tasks", exc_info=True, extra=self._get_log_extra(log_type="genesys_ces_task_error"))
-                        await self.send_disconnect("error", f"Task creation Error: {e}")
-                        return
-
-                    logger.info("Genesys session opened", extra=self._get_log_extra(log_type="genesys_open"))
-
-                custom_config_str = parameters.get("customConfig")
-                if custom_config_str:
-                    logger.info("Found customConfig from Genesys", extra=self._get_log_extra(log_type="genesys_custom_config", data={"custom_config_str": custom_config_str}))
+                elif "_agent_id" in self.input_variables:
+                    self.agent_id = self.input_variables["_agent_id"]
+                if "_initial_message" in self.input_variables:
                     try:
-                        custom_config = json.loads(custom_config_str)
-                        if isinstance(custom_config, dict):
-                            for key, value in custom_config.items():
-                                logger.info("Custom config item", extra=self._get_log_extra(log_type="genesys_custom_config", data={"key": key, "value": value}))
-                        else:
-                            logger.warning("Custom config is not a dict", extra=self._get_log_extra(log_type="genesys_custom_config", data={"custom_config": custom_config}))
+                      self.initial_message = json.loads(self.input_variables["_initial_message"])
                     except json.JSONDecodeError:
-                        logger.error("Error decoding customConfig JSON", extra=self._get_log_extra(log_type="genesys_custom_config_error", data={"custom_config": custom_config_str}))
-
-                offered_media = parameters.get("media", [])
-                selected_media = None
-                for media_option in offered_media:
-                    if (
-                        media_option.get("type") == "audio"
-                        and media_option.get("format") == "PCMU"
-                        and media_option.get("rate") == 8000
-                    ):
-                        selected_media = media_option
-                        break
-
-                if not selected_media:
-                    await self.send_disconnect(
-                        "error", "No compatible audio media offered."
-                    )
-                    return
-
-                opened_message = {
-                    "type": "opened",
-                    "version": "2",
-                    "id": self.client_session_id,
-                    "clientseq": self.last_client_sequence_number,
-                    "parameters": {"startPaused": False, "media": [selected_media]},
-                }
-                logger.info("Sending 'opened' message to Genesys", extra=self._get_log_extra(log_type="genesys_send_opened", data={"opened_msg": opened_message}))
-                await self.send_message(opened_message)
-
-            elif message_type == "ping":
-                logger.info("Received 'ping' message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_ping"))
-                pong_message = {
-                    "type": "pong",
-                    "version": "2",
-                    "id": self.client_session_id,
-                    "clientseq": self.last_client_sequence_number,
+                        logger.warning(f"Failed to JSON decode _initial_message: {self.input_variables['_initial_message']}", exc_info=True, extra=self._get_log_extra(log_type="genesys_config_warning"))
+                        self.initial_message = self.input_variables["_initial_message"] # Fallback to using the raw string
+                if "_session_id" in self.input_variables:
+                    self.session_id = self.input_variables["_session_id"]
+
+                self.ces_input_variables = {
+                    k: v
+                    for k, v in self.input_variables.items()
+                    if not k.startswith("_")
                 }
-                await self.send_message(pong_message)
-
-            elif message_type == "playback_started":
-                logger.info("Received playback-started from Genesys", extra=self._get_log_extra(log_type="genesys_recv_playback_started", data={"data": data}))
-
-            elif message_type == "playback_completed":
-                logger.info("Received playback-completed from Genesys", extra=self._get_log_extra(log_type="genesys_recv_playback_completed", data={"data": data}))
-
-            elif message_type == "dtmf":
-                logger.info("Received 'dtmf' message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_dtmf"))
-                digit = data.get("parameters", {}).get("digit")
-                if digit:
-                    logger.info("Received DTMF from Genesys", extra=self._get_log_extra(log_type="genesys_recv_dtmf", data={"digit": redact_value(digit)}))
-                    if self.ces_ws:
-                        await self.ces_ws.send_dtmf(digit)
-                else:
-                    logger.warning("Received DTMF message without digit", extra=self._get_log_extra(log_type="genesys_recv_dtmf_missing", data={"data": data}))
-            elif message_type == "close":
-                logger.info("Received 'close' message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_closed"))
-                
-                if self.disconnect_initiated:
-                    logger.info("Disconnect already initiated by adapter, sending 'closed' immediately.", extra=self._get_log_extra(log_type="genesys_close_ack"))
-                else:
-                    logger.info("Signalling CES and waiting up to 2s for session to end...", extra=self._get_log_extra(log_type="genesys_recv_close_start"))
-                    if self.ces_ws and self.ces_ws.is_connected() and not self.ces_ws.endsession_received:
-                        logger.info(f"Sending '{DISCONNECT_EVENT_NAME}' event to CES", extra=self._get_log_extra(log_type="genesys_send_ces_event"))
-                        await self.ces_ws.send_genesys_disconnect_event()
-                        
-                        try:
-                            logger.debug(f"Waiting up to {self.close_wait_timeout} seconds for CES to process disconnect event...", extra=self._get_log_extra(log_type="genesys_close_wait"))
-                            await asyncio.wait_for(self.ces_data_received.wait(), timeout=self.close_wait_timeout)
-                            logger.info("CES finished processing disconnect event.", extra=self._get_log_extra(log_type="genesys_close_ces_complete"))
-                        except asyncio.TimeoutError:
-                            logger.warning(f"Timeout waiting for CES to process event after {self.close_wait_timeout}s. Proceeding with close.", extra=self._get_log_extra(log_type="genesys_close_timeout"))
-                        except Exception as e:
-                            logger.error(f"Error waiting for CES event: {e}", extra=self._get_log_extra(log_type="genesys_close_error"), exc_info=True)
-                    else:
-                        logger.warning("CES WS not connected, cannot send disconnect event", extra=self._get_log_extra(log_type="genesys_ces_event_skip"))
-
-                self.disconnect_initiated = True
+                self.ces_input_variables["adapterSessionId"] = self.adapter_session_id
+
+            if not self.agent_id:
+                logger.error("Missing _deployment_id or _agent_id", extra=self._get_log_extra(log_type="genesys_config_error", data={"input_variables": self.input_variables}))
+                await self.send_disconnect(
+                    "error",
+                    "Missing required parameter: _agent_id or _deployment_id",
+                )
+                return
+
+            debug_logging.update(self)
+
+            if not config.PIPELINED_SETUP and not await self.start_ces():
+                return
+
+        selected_media = audio.select_media(message.media, config.GENESYS_MEDIA_FORMATS)
+        if not selected_media:
+            await self.send_disconnect(
+                "error", "No compatible audio media offered."
+            )
+            return
+        self.customer_channel_index, self.channel_count = audio.customer_channel_layout(selected_media)
+        self.ces_ws.configure_audio(selected_media)
+        if self.capture:
+            self.capture.genesys_encoding = audio.GENESYS_FORMATS[selected_media["format"]]
+
+        opened_message = self._response("opened", {"startPaused": False, "media": [selected_media]})
+        logger.info("Sending 'opened' message to Genesys", extra=self._get_log_extra(log_type="genesys_send_opened", data={"opened_msg": opened_message}))
+        await self.send_message(opened_message)
+        metrics.observe("setup_opened_ms", (time.perf_counter() - self.setup_started) * 1000)
+
+        if not self.is_probe and config.PIPELINED_SETUP:
+            # Caller audio is buffered by CESWS until CES is configured.
+            self.ces_ws.pre_connect_audio = bytearray()
+            self.setup_task = asyncio.create_task(self.start_ces())
+
+    def _apply_custom_config(self, custom_config_str):
+        logger.info("Found customConfig from Genesys", extra=self._get_log_extra(log_type="genesys_custom_config", data={"custom_config_str": custom_config_str}))
+        try:
+            custom_config = json.loads(custom_config_str)
+        except json.JSONDecodeError:
+            logger.error("Error decoding customConfig JSON", extra=self._get_log_extra(log_type="genesys_custom_config_error", data={"custom_config": custom_config_str}))
+            return
+        if not isinstance(custom_config, dict):
+            logger.warning("Custom config is not a dict", extra=self._get_log_extra(log_type="genesys_custom_config", data={"custom_config": custom_config}))
+            return
+        for key, value in custom_config.items():
+            logger.info("Custom config item", extra=self._get_log_extra(log_type="genesys_custom_config", data={"key": key, "value": value}))
+        self.ces_ws.settings, applied, rejected = call_settings.from_custom_config(custom_config)
+        if applied:
+            logger.info("Applied per-call settings from customConfig", extra=self._get_log_extra(log_type="genesys_custom_config", data={"applied": applied}))
+        if rejected:
+            metrics.increment("custom_config_rejected", len(rejected))
+            logger.warning("Ignoring invalid customConfig settings, using the defaults", extra=self._get_log_extra(log_type="genesys_custom_config_warning", data={"rejected": rejected}))
+
+    async def _on_ping(self, message):
+        logger.info("Received 'ping' message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_ping"))
+        await self.send_message(self._response("pong"))
+
+    async def _on_playback_started(self, message):
+        logger.info("Received playback-started from Genesys", extra=self._get_log_extra(log_type="genesys_recv_playback_started", data={"data": message.data}))
+
+    async def _on_playback_completed(self, message):
+        logger.info("Received playback-completed from Genesys", extra=self._get_log_extra(log_type="genesys_recv_playback_completed", data={"data": message.data}))
+
+    async def _on_dtmf(self, message):
+        logger.info("Received 'dtmf' message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_dtmf"))
+        digit = message.digit
+        if digit:
+            logger.info("Received DTMF from Genesys", extra=self._get_log_extra(log_type="genesys_recv_dtmf", data={"digit": redact_value(digit)}))
+            if self.ces_ws:
+                await self.ces_ws.send_dtmf(digit)
+        else:
+            logger.warning("Received DTMF message without digit", extra=self._get_log_extra(log_type="genesys_recv_dtmf_missing", data={"data": message.data}))
 
-                if self.ces_ws:
-                    logger.info("Teardown: Closing CES connection before sending 'closed' to Genesys", extra=self._get_log_extra(log_type="genesys_close_ces_teardown"))
-                    await self.ces_ws.close()
+    async def _on_close(self, message):
+        self.cpu.skip(sessions.TEXT)
+        close_received = time.perf_counter()
+        if self.teardown_started is None:
+            self.teardown_started = close_received
+        logger.info("Received 'close' message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_closed"))
 
-                closed_message = {
-                    "type": "closed",
-                    "version": "2",
-                    "id": self.client_session_id,
-                    "clientseq": self.last_client_sequence_number,
-                    "parameters": {}
-                }
-                logger.info("Sending 'closed' message to Genesys", extra=self._get_log_extra(log_type="genesys_send_closed", data={"closed_message": redact(closed_message)}))
-                await self.send_message(closed_message)
-                # Genesys will close the connection after receiving 'closed'.
+        if self.disconnect_initiated:
+            logger.info("Disconnect already initiated by adapter, sending 'closed' immediately.", extra=self._get_log_extra(log_type="genesys_close_ack"))
+        else:
+            logger.info(f"Signalling CES and waiting up to {self.close_wait_timeout}s for session to end...", extra=self._get_log_extra(log_type="genesys_recv_close_start"))
+            if self.ces_ws and self.ces_ws.is_connected() and not self.ces_ws.endsession_received:
+                logger.info(f"Sending '{DISCONNECT_EVENT_NAME}' event to CES", extra=self._get_log_extra(log_type="genesys_send_ces_event"))
+                await self.ces_ws.send_genesys_disconnect_event()
+
+                try:
+                    logger.debug(f"Waiting up to {self.close_wait_timeout} seconds for CES to process disconnect event...", extra=self._get_log_extra(log_type="genesys_close_wait"))
+                    await asyncio.wait_for(self.ces_data_received.wait(), timeout=self.close_wait_timeout)
+                    logger.info("CES finished processing disconnect event.", extra=self._get_log_extra(log_type="genesys_close_ces_complete"))
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timeout waiting for CES to process event after {self.close_wait_timeout}s. Proceeding with close.", extra=self._get_log_extra(log_type="genesys_close_timeout"))
+                except Exception as e:
+                    logger.error(f"Error waiting for CES event: {e}", extra=self._get_log_extra(log_type="genesys_close_error"), exc_info=True)
+            else:
+                logger.warning("CES WS not connected, cannot send disconnect event", extra=self._get_log_extra(log_type="genesys_ces_event_skip"))
 
-            elif message_type == "update":
-                logger.info("Received update message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_update", data={"data": data}))
+        self.disconnect_initiated = True
+        await self.cancel_setup()
 
-            else:
-                logger.info("Received unhandled message type from Genesys", extra=self._get_log_extra(log_type="genesys_recv_unhandled", data={"message_type": message_type, "data": data}))
+        closed_message = self._response("closed", {})
+        logger.info("Sending 'closed' message to Genesys", extra=self._get_log_extra(log_type="genesys_send_closed", data={"closed_message": redact(closed_message)}))
+        if self.ces_ws:
+            # Nothing may be sent after 'closed', so the pacer is stopped
+            # first; closing CES then overlaps with the acknowledgement.
+            await self.ces_ws.stop_audio()
+            logger.info("Teardown: Closing CES connection while sending 'closed' to Genesys", extra=self._get_log_extra(log_type="genesys_close_ces_teardown"))
+            await asyncio.gather(self.ces_ws.close(), self.send_message(closed_message))
+        else:
+            await self.send_message(closed_message)
+        metrics.observe("close_ack_ms", (time.perf_counter() - close_received) * 1000)
+        # Genesys will close the connection after receiving 'closed'.
+
+    # Genesys notifies `paused` and `resumed`; the `pause` and `resume`
+    # requests only go the other way, so they are not handled here.
+    async def _on_paused(self, message):
+        logger.info("Received paused message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_paused"))
+        await self.set_paused(True)
+
+    async def _on_resumed(self, message):
+        logger.info("Received resumed message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_resumed", data={"parameters": message.parameters}))
+        await self.set_paused(False)
+
+    async def _on_update(self, message):
+        logger.info("Received update message from Genesys", extra=self._get_log_extra(log_type="genesys_recv_update", data={"data": message.data}))
+
+    _TEXT_HANDLERS = {
+        "open": _on_open,
+        "ping": _on_ping,
+        "playback_started": _on_playback_started,
+        "playback_completed": _on_playback_completed,
+        "dtmf": _on_dtmf,
+        "close": _on_close,
+        "paused": _on_paused,
+        "resumed": _on_resumed,
+        "update": _on_update,
+    }
+
+    async def start_ces(self):
+        """Connects to CES and starts the listener and pacer tasks."""
+        if config.PIPELINED_SETUP and self.ces_ws.setup_prompt is not None:
+            # `opened` has been sent, so the caller can already hear audio.
+            self.ces_ws.start_setup_prompt()
+        if not await self.ces_ws.connect(self.agent_id, self.deployment_id, self.initial_message, self.session_id):
+            logger.error("CES connection failed, stopping setup", extra=self._get_log_extra(log_type="genesys_config_error"))
+            if self.ces_ws.pacer_task:
+                await self.ces_ws.stop_audio()
+            return False # Disconnect is handled within ces_ws.connect
 
-        except json.JSONDecodeError:
-            logger.error("Error decoding JSON from Genesys", extra=self._get_log_extra(log_type="genesys_json_decode_error", data={"message": message}))
-            await self.send_disconnect("error", "Invalid JSON received")
+        try:
+            self.ces_ws.listen_task = asyncio.create_task(self.ces_ws.listen())
+            if self.ces_ws.pacer_task is None:
+                self.ces_ws.pacer_task = asyncio.create_task(self.ces_ws.pacer())
+        except Exception as e:
+            logger.error("Error creating CES listener or pacer tasks", exc_info=True, extra=self._get_log_extra(log_type="genesys_ces_task_error"))
+            await self.send_disconnect("error", f"Task creation Error: {e}")
+            return False
+
+        metrics.observe("setup_ces_ready_ms", (time.perf_counter() - self.setup_started) * 1000)
+        logger.info("Genesys session opened", extra=self._get_log_extra(log_type="genesys_open"))
+        return True
+
+    async def cancel_setup(self):
+        """Cancels a background CES setup that has not finished yet."""
+        if self.setup_task and not self.setup_task.done():
+            logger.info("Cancelling CES setup in progress", extra=self._get_log_extra(log_type="genesys_setup_cancel"))
+            self.setup_task.cancel()
+            try:
+                await self.setup_task
+            except asyncio.CancelledError:
+                pass
 
     async def send_disconnect(self, reason="normal", info=None, output_variables=None):
         if self.disconnect_initiated:
             logger.info("Disconnect already in progress, skipping duplicate call", extra=self._get_log_extra(log_type="genesys_disconnect_duplicate"))
             return
         self.disconnect_initiated = True
+        if self.teardown_started is None:
+            self.teardown_started = time.perf_counter()
         logger.info("Preparing to send disconnect", extra=self._get_log_extra(log_type="genesys_disconnect_start", data={"reason": reason, "info": info, "output_variables": output_variables}))
-        disconnect_message = {
-            "type": "disconnect",
-            "version": "2",
-            "id": self.client_session_id,
-            "clientseq": self.last_client_sequence_number,
-            "parameters": {"reason": reason},
-        }
+        disconnect_message = self._response("disconnect", {"reason": reason})
 
         if info:
             disconnect_message["parameters"]["info"] = info
@@ -308,17 +451,76 @@ class GenesysWS:
         await self.send_message(disconnect_message)
 
 
+    async def reap(self, reason: str, grace: float):
+        """Disconnects a session the watchdog found stuck.
+
+        If Genesys has not closed the connection `grace` seconds after the
+        `disconnect`, it is closed from this side so that the session and its
+        buffers are released either way.
+        """
+        logger.warning("Watchdog reaping session", extra=self._get_log_extra(log_type="watchdog_reap", data={"reason": reason, "state": sessions.describe(self)}))
+        try:
+            async with asyncio.timeout(grace):
+                await self.send_disconnect("error", info=f"Session ended by watchdog: {reason}")
+                await self.websocket.wait_closed()
+        except TimeoutError:
+            logger.warning("Genesys did not close reaped session, closing it", extra=self._get_log_extra(log_type="watchdog_close"))
+            await self.websocket.close(1011, "Session ended by watchdog")
+
+    def _response(self, message_type: str, parameters: dict = None) -> dict:
+        """Builds a message answering the last message received from Genesys."""
+        response = {
+            "type": message_type,
+            "version": "2",
+            "id": self.client_session_id,
+            "clientseq": self.last_client_sequence_number,
+        }
+        if parameters is not None:
+            response["parameters"] = parameters
+        return response
+
     def get_next_server_sequence_number(self):
         self.last_server_sequence_number += 1
         return self.last_server_sequence_number
 
+    async def set_paused(self, paused: bool):
+        """Suspends or resumes forwarding audio in both directions.
+
+        While paused, caller audio is dropped instead of being sent to CES,
+        and the pacer holds CES audio until the stream resumes.
+        """
+        if paused == self.paused:
+            return
+        self.paused = paused
+        now = time.monotonic()
+        if paused:
+            self.paused_at = now
+            metrics.increment("genesys_pauses")
+            event_name = config.PAUSE_EVENT_NAME
+        else:
+            metrics.observe("genesys_pause_seconds", now - self.paused_at)
+            if self.ces_ws and self.ces_ws.last_received_at:
+                # CES is usually quiet during a hold, which is not idleness.
+                self.ces_ws.last_received_at = max(self.ces_ws.last_received_at, now)
+            logger.info("Genesys audio resumed", extra=self._get_log_extra(log_type="genesys_resumed", data={"paused_seconds": round(now - self.paused_at, 1)}))
+            self.paused_at = None
+            event_name = config.RESUME_EVENT_NAME
+        if event_name and self.ces_ws and self.ces_ws.is_connected():
+            await self.ces_ws.send_event(event_name)
+
     async def handle_binary_message(self, message):
         if self.disconnect_initiated:
             logger.info("GenesysWS: Ignoring binary message during disconnect", extra=self._get_log_extra(log_type="genesys_ignore_binary"))
             return
+        if self.paused:
+            metrics.increment("genesys_paused_dropped_bytes", len(message))
+            return
 
-        if logger.isEnabledFor(logging.DEBUG):
+        if self.debug:
             logger.debug("GenesysWS: Received binary message", extra=self._get_log_extra(log_type="genesys_recv_binary", data={"audio_size": len(message)}))
+        if self.channel_count > 1:
+            # Only the customer channel is forwarded to CES.
+            message = audio.demux(message, self.customer_channel_index, self.channel_count, self.ces_ws.genesys_sample_width)
         if self.ces_ws:
             await self.ces_ws.send_audio(message)
 
@@ -328,8 +530,13 @@ class GenesysWS:
             return
         try:
             message['seq'] = self.get_next_server_sequence_number()
-            logger.debug("Sending message to Genesys", extra=self._get_log_extra(log_type="genesys_send", data={"payload": redact(message)}))
-            await self.websocket.send(json.dumps(message))
+            if self.debug:
+                logger.debug("Sending message to Genesys", extra=self._get_log_extra(log_type="genesys_send", data={"payload": redact(message)}))
+            payload = json.dumps(message)
+            if self.capture:
+                self.capture.record(capture.GENESYS_OUT, payload)
+            self.sent_bytes += len(payload)
+            await genesys_leg.send(self.websocket, payload)
         except Exception as e:
             logger.error("Error sending message to Genesys", exc_info=True, extra=self._get_log_extra(log_type="genesys_send_error", data={"payload": redact(message)}))
             raise
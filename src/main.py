@@ -16,34 +16,115 @@ import asyncio
 import http
 import logging
 import sys
+import time
 import uuid
 
 import websockets
 
-from . import config
+from . import (
+    IMPORT_STARTED,
+    admin,
+    audio,
+    circuit_breaker,
+    config,
+    debug_logging,
+    endpoints,
+    metrics,
+    offload,
+    prompts,
+    transport,
+    watchdog,
+)
 from .auth import auth_provider
+from .ces_ws import resolve_ces_host
 from .genesys_ws import GenesysWS
 from .logging_utils import setup_logger
+from .rate_limit import api_key_prefix, client_address, upgrade_limiter
 from .redaction import redact
 
 # Setup JSON logging for the entire application
 setup_logger()
+debug_logging.install()
 logger = logging.getLogger(__name__)
 logger.info("Using websockets version", extra={"log_type": "init", "version": websockets.__version__})
 
+# Startup timings in milliseconds since the `src` package was first imported.
+_startup = {"ready_ms": None, "first_connection_ms": None}
 
-def process_request(connection, request):
+# Tasks running for the life of the server, cancelled on shutdown. The event
+# loop only keeps weak references to tasks.
+_background_tasks = []
+
+metrics.register_provider("auth_rate_limit_keys", lambda: len(upgrade_limiter))
+metrics.register_provider("startup", lambda: dict(_startup))
+
+
+def _elapsed_ms():
+    return round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
+
+
+async def warm_up():
+    """
+    Prefetches the CES token and resolves the CES host so the first calls on
+    a new instance do not pay for them. Failures are logged and left to be
+    retried by the calls themselves.
+    """
+    steps = {"token": auth_provider.warm_up(), "dns": resolve_ces_host()}
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*steps.values(), return_exceptions=True),
+            timeout=config.WARMUP_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Warm-up timed out", extra={"log_type": "init", "timeout": config.WARMUP_TIMEOUT})
+        return
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.warning("Warm-up step failed", extra={"log_type": "init", "step": name, "error": str(result)})
+
+
+async def process_request(connection, request):
     """
     This function is called before the WebSocket connection is established.
-    It handles /health checks and authenticates WebSocket upgrade requests
-    using the modern `websockets` API.
+    It handles /health and /admin/ requests and authenticates
+    WebSocket upgrade requests using the modern `websockets` API.
     """
-    # Handle /health check endpoint
+    # Handle /health check endpoint. The instance only reports healthy once
+    # warm-up has finished, so the startup probe gates traffic on it. Open
+    # circuit breakers are listed but do not fail the check, since every
+    # instance shares the same CES.
     if request.path == "/health":
-        return connection.respond(http.HTTPStatus.OK, "OK\n")
+        if _startup["ready_ms"] is None:
+            return connection.respond(http.HTTPStatus.SERVICE_UNAVAILABLE, "Starting\n")
+        body = "OK\n" + "".join(f"circuit {location}: {state}\n" for location, state in circuit_breaker.not_closed().items())
+        return connection.respond(http.HTTPStatus.OK, body)
+
+    # Admin endpoints, including /admin/metrics, are authenticated with their
+    # own key (see src/admin.py). /health is the only anonymous path.
+    if request.path.startswith("/admin/"):
+        return await admin.handle(connection, request)
+
+    rate_limit_keys = ()
+    if config.AUTH_RATE_LIMIT_BURST > 0:
+        # Genesys connects from shared egress addresses, so limiting by
+        # address would let one misconfigured connector block every call
+        # from its region. It is opt-in.
+        rate_limit_keys = (f"key:{api_key_prefix(request)}",)
+        if config.AUTH_RATE_LIMIT_BY_ADDRESS:
+            rate_limit_keys += (f"addr:{client_address(connection, request)}",)
 
     # For all other paths, proceed with WebSocket authentication.
     if not auth_provider.verify_request(request):
+        metrics.increment("auth_failures")
+        # Only failures are limited: a client sending an API key with bad
+        # signatures must not lock out the connectors that sign correctly
+        # with the same key. Limited clients are answered without logging.
+        limited = [key for key in rate_limit_keys if upgrade_limiter.is_limited(key)]
+        for key in rate_limit_keys:
+            upgrade_limiter.consume(key)
+        if limited:
+            metrics.increment(f"auth_rate_limited_{limited[0].split(':', 1)[0]}")
+            return connection.respond(http.HTTPStatus.TOO_MANY_REQUESTS, "Too Many Requests\n")
         logger.info("Request came in", extra={"log_type": "auth", "path": request.path})
         logger.warning("WebSocket connection rejected: invalid API key or signature.", extra={"log_type": "auth_error"})
         return connection.respond(http.HTTPStatus.UNAUTHORIZED, "Unauthorized\n")
@@ -58,6 +139,9 @@ async def handler(websocket):
     This function is called for each incoming WebSocket connection.
     """
     adapter_session_id = str(uuid.uuid4())
+    if _startup["first_connection_ms"] is None:
+        _startup["first_connection_ms"] = _elapsed_ms()
+        logger.info("First connection accepted", extra={"log_type": "init", "startup_ms": _startup["first_connection_ms"]})
     logger.info("New connection", extra={"log_type": "connection_start", "remote_address": websocket.remote_address, "adapter_session_id": adapter_session_id})
     genesys_ws = GenesysWS(websocket, adapter_session_id)
     await genesys_ws.handle_connection()
@@ -89,19 +173,65 @@ async def main():
     if config.GENESYS_CLIENT_SECRET:
         logger.info("Genesys signature verification is enabled.", extra={"log_type": "config"})
 
-    logger.info("Starting WebSocket server", extra={"log_type": "init", "port": config.PORT})
+    if config.CES_AUDIO_ENCODING not in audio.SAMPLE_WIDTHS:
+        logger.error("Unsupported CES_AUDIO_ENCODING, expected MULAW or LINEAR16.", extra={"log_type": "config_error", "encoding": config.CES_AUDIO_ENCODING})
+        sys.exit(1)
+
+    if config.TRANSPORT_PROFILE not in transport.PROFILES:
+        logger.warning("Unknown TRANSPORT_PROFILE, using 'default'", extra={"log_type": "config_error", "profile": config.TRANSPORT_PROFILE})
+
+    try:
+        prompts.load()
+    except (OSError, ValueError):
+        logger.error("Could not load prompt audio", exc_info=True, extra={"log_type": "config_error"})
+        sys.exit(1)
+
+    if config.OFFLOAD_MESSAGE_BYTES > 0:
+        offload.start()
+
+    logger.info(
+        "Starting WebSocket server",
+        extra={
+            "log_type": "init",
+            "port": config.PORT,
+            "event_loop": type(asyncio.get_running_loop()).__module__,
+            "transport_profile": config.TRANSPORT_PROFILE,
+        },
+    )
 
     # For older versions of `websockets`, we must catch the exception
     # raised by plain HTTP requests (like health checks) to prevent crashes.
     async with websockets.serve(
         handler, "0.0.0.0", config.PORT, process_request=process_request,
-        max_size=4 * 1024 * 1024  # Increase limit to 4 MiB
+        **transport.server_options()
     ) as server:
-        await server.serve_forever()
+        await warm_up()
+        _startup["ready_ms"] = _elapsed_ms()
+        logger.info("Server ready", extra={"log_type": "init", "startup_ms": _startup["ready_ms"]})
+        if config.CES_ENDPOINTS and config.CES_ENDPOINT_PROBE_INTERVAL_MS > 0:
+            _background_tasks.append(asyncio.create_task(endpoints.selector.probe_forever(config.CES_ENDPOINT_PROBE_INTERVAL_MS / 1000)))
+        if watchdog.enabled():
+            _background_tasks.append(asyncio.create_task(watchdog.run(config.WATCHDOG_INTERVAL_MS / 1000)))
+        try:
+            await server.serve_forever()
+        finally:
+            for task in _background_tasks:
+                task.cancel()
+
+
+def get_loop_factory():
+    """Returns the event loop factory selected by EVENT_LOOP, or None for asyncio's default."""
+    if config.EVENT_LOOP == "uvloop":
+        try:
+            import uvloop
+            return uvloop.new_event_loop
+        except ImportError:
+            logger.warning("uvloop is not installed, using the default asyncio event loop.", extra={"log_type": "config_error"})
+    return None
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(), loop_factory=get_loop_factory())
     except KeyboardInterrupt:
         logger.info("Server stopped manually.", extra={"log_type": "shutdown"})
@@ -0,0 +1,73 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Parsed AudioHook text messages received from Genesys."""
+
+import json
+
+
+class Message:
+    """One AudioHook text message, parsed once and shared by all handlers.
+
+    `data` keeps the decoded JSON object for logging and for fields that
+    have no attribute.
+    """
+
+    __slots__ = ("data", "type", "seq", "id", "parameters")
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.type = data.get("type")
+        self.seq = data.get("seq")
+        self.id = data.get("id")
+        parameters = data.get("parameters")
+        self.parameters = parameters if isinstance(parameters, dict) else {}
+
+
+class OpenMessage(Message):
+    __slots__ = ("conversation_id", "input_variables", "media", "custom_config")
+
+    def __init__(self, data: dict):
+        super().__init__(data)
+        self.conversation_id = self.parameters.get("conversationId")
+        self.input_variables = self.parameters.get("inputVariables")
+        self.media = self.parameters.get("media", [])
+        self.custom_config = self.parameters.get("customConfig")
+
+
+class DtmfMessage(Message):
+    __slots__ = ("digit",)
+
+    def __init__(self, data: dict):
+        super().__init__(data)
+        self.digit = self.parameters.get("digit")
+
+
+_MESSAGE_CLASSES = {"open": OpenMessage, "dtmf": DtmfMessage}
+
+
+def from_data(data) -> Message:
+    """Wraps a decoded Genesys text frame.
+
+    Raises:
+        ValueError: If the frame is not a JSON object.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("AudioHook message is not a JSON object")
+    return _MESSAGE_CLASSES.get(data.get("type"), Message)(data)
+
+
+def parse(text: str) -> Message:
+    """Parses a Genesys text frame, raising ValueError if it is invalid."""
+    return from_data(json.loads(text))
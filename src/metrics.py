@@ -0,0 +1,57 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Process-wide counters reported on the /admin/metrics endpoint."""
+
+import collections
+
+_counters = collections.Counter()
+_summaries = {}  # name -> [count, total, max]
+_providers = {}
+
+
+def increment(name: str, value: int = 1):
+    """Adds `value` to the counter called `name`."""
+    _counters[name] += value
+
+
+def observe(name: str, value: float):
+    """Records one observation of `name` in a count/mean/max summary."""
+    summary = _summaries.get(name)
+    if summary is None:
+        _summaries[name] = [1, value, value]
+        return
+    summary[0] += 1
+    summary[1] += value
+    if value > summary[2]:
+        summary[2] = value
+
+
+def register_provider(name: str, provider):
+    """Registers a callable whose return value is reported under `name`."""
+    _providers[name] = provider
+
+
+def snapshot() -> dict:
+    """Returns the current counters, summaries and provider values."""
+    result = {
+        "counters": dict(_counters),
+        "summaries": {
+            name: {"count": count, "mean": round(total / count, 3), "max": round(maximum, 3)}
+            for name, (count, total, maximum) in _summaries.items()
+        },
+    }
+    for name, provider in _providers.items():
+        result[name] = provider()
+    return result
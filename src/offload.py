@@ -0,0 +1,110 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Decoding of oversized messages in worker processes.
+
+JSON parsing, base64 decoding and redaction all hold the GIL, so a large
+message decoded on the event loop stalls every call on the instance, and
+a thread pool would not help. Messages of at least OFFLOAD_MESSAGE_BYTES
+are therefore decoded in a small process pool while only the session that
+received them waits.
+"""
+
+import asyncio
+import bisect
+import concurrent.futures
+import logging
+import multiprocessing
+import time
+
+from . import config, metrics, offload_worker
+from .offload_worker import CES, GENESYS
+from .redaction import unredacted
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in bytes, of the buckets of the message size histograms.
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_histograms = {source: [0] * (len(SIZE_BUCKETS) + 1) for source in (GENESYS, CES)}
+_executor = None
+
+
+def should_offload(source: str, size: int) -> bool:
+    """Counts a message of `size` bytes and returns True if it should be offloaded."""
+    _histograms[source][bisect.bisect_left(SIZE_BUCKETS, size)] += 1
+    return _executor is not None and 0 < config.OFFLOAD_MESSAGE_BYTES <= size
+
+
+def start():
+    """Starts the worker pool.
+
+    Workers are forked from a single-threaded fork server rather than from
+    this process, which by now may run gRPC and other threads that a fork
+    would copy in an inconsistent state. Like any process started that way,
+    each worker then imports the main module, and with it the configuration.
+    """
+    global _executor
+    offload_worker.init(not unredacted())
+    context = multiprocessing.get_context("forkserver")
+    # The fork server would otherwise import the main module, and with it
+    # the configuration.
+    context.set_forkserver_preload([offload_worker.__name__])
+    _executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=config.OFFLOAD_WORKERS,
+        mp_context=context,
+        initializer=offload_worker.init,
+        initargs=(not unredacted(),),
+    )
+    _executor.submit(offload_worker.decode, GENESYS, "{}").result()
+    logger.info("Started offload workers", extra={"log_type": "init", "workers": config.OFFLOAD_WORKERS, "threshold_bytes": config.OFFLOAD_MESSAGE_BYTES})
+
+
+async def decode(source: str, message: str) -> tuple:
+    """Decodes `message` in the worker pool, which `start` must have started.
+
+    If the pool fails, the message is decoded inline instead.
+
+    Returns:
+        The decoded message, as `decode_ces_message` or `json.loads` would
+        return it, and a redacted copy for logging, or None for audio. CES
+        messages only keep the fields the listener acts on.
+
+    Raises:
+        ValueError: If the message is not valid JSON.
+    """
+    if _executor is None:
+        raise RuntimeError("offload.start() has not been called")
+    started = time.perf_counter()
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(_executor, offload_worker.decode, source, message)
+    except ValueError:
+        # Not valid JSON; decoding inline would fail the same way.
+        raise
+    except Exception:
+        logger.warning("Offload worker failed, decoding inline", exc_info=True, extra={"log_type": "offload_error", "source": source})
+        metrics.increment("offload_fallbacks")
+        return offload_worker.decode(source, message)
+    metrics.increment(f"offloaded_{source}_messages")
+    metrics.observe("offload_ms", (time.perf_counter() - started) * 1000)
+    return result
+
+
+def size_histograms() -> dict:
+    """Returns the message count per size bucket for each source."""
+    labels = [f"<={bound // 1024}KiB" for bound in SIZE_BUCKETS] + [f">{SIZE_BUCKETS[-1] // 1024}KiB"]
+    return {source: dict(zip(labels, counts)) for source, counts in _histograms.items()}
+
+
+metrics.register_provider("message_sizes", size_histograms)
@@ -0,0 +1,74 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Message decoding run by the offload worker processes.
+
+The fork server that starts the workers imports only this module. It must
+not import the configuration, whose secret resolution starts gRPC threads
+that every worker forked from the server would inherit. The settings the
+workers need are passed to `init` instead.
+"""
+
+import base64
+import json
+
+from .redaction import dict_redact
+
+GENESYS, CES = "genesys", "ces"
+
+# Fields of a CES message that the listener acts on, rather than just logs.
+_CES_FIELDS = ("interruptionSignal", "endSession", "recognitionResult")
+_CES_OUTPUT_FIELDS = ("audio", "text")
+
+_redacted = True
+
+
+def init(redacted: bool):
+    """Worker initializer; `redacted` is False if LOG_UNREDACTED_DATA is 'true'."""
+    global _redacted
+    _redacted = redacted
+
+
+def decode_ces_message(message: str) -> dict:
+    """Parses a CES message, with `sessionOutput.audio` decoded to bytes."""
+    data = json.loads(message)
+    output = data.get("sessionOutput") if isinstance(data, dict) else None
+    if isinstance(output, dict) and isinstance(output.get("audio"), str):
+        output["audio"] = base64.b64decode(output["audio"])
+    return data
+
+
+def _slim_ces_message(data):
+    # Unpickling a result costs the event loop about half as much as parsing
+    # it would, so only the fields the listener uses are sent back.
+    slim = {key: data[key] for key in _CES_FIELDS if key in data}
+    output = data.get("sessionOutput")
+    if isinstance(output, dict):
+        slim["sessionOutput"] = {key: output[key] for key in _CES_OUTPUT_FIELDS if key in output}
+    return slim
+
+
+def decode(source: str, message: str) -> tuple:
+    """Decodes `message`; see `offload.decode`."""
+    # Audio messages are never logged, so only the other messages get a
+    # redacted copy.
+    data = decode_ces_message(message) if source == CES else json.loads(message)
+    if not isinstance(data, dict):
+        return data, None
+    log_data = dict_redact(data) if _redacted else data
+    if source == CES:
+        if isinstance(data.get("sessionOutput"), dict) and "audio" in data["sessionOutput"]:
+            return data, None
+        return _slim_ces_message(data), log_data
+    return data, log_data
@@ -0,0 +1,139 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Playout clock and adaptive lead for audio paced to Genesys."""
+
+from . import metrics
+
+# Audio that resumes within this many seconds of Genesys running out was
+# late, rather than the start of a new utterance.
+UNDERRUN_WINDOW = 0.5
+
+# Extra lead added after each underrun, and the seconds of smooth playback
+# over which that extra lead halves again.
+UNDERRUN_STEP = 0.1
+BOOST_HALF_LIFE = 5.0
+
+# Lead kept per second of measured arrival jitter.
+JITTER_FACTOR = 4
+
+# Gain of the running jitter estimate, as in RFC 3550.
+JITTER_GAIN = 1 / 16
+
+
+class PlayoutClock:
+    """Tracks how much audio Genesys should have been sent for one stream.
+
+    Genesys is kept `interval + lead` seconds ahead of real time, so that
+    `lead` seconds are still queued there when the next send is due. A
+    stream therefore starts once that much audio is buffered, or once audio
+    has waited that long, whichever comes first. From then on the audio due
+    is computed from the stream start and the number of bytes already sent,
+    never from the time since the previous send, so a late wakeup is made up
+    on the next send instead of being lost.
+
+    The lead follows the measured lateness of CES audio, is raised after
+    every underrun and decays back while playback is smooth.
+    """
+
+    __slots__ = (
+        "bytes_per_second", "interval", "min_lead", "max_lead", "lead",
+        "jitter", "underruns", "_boost", "_start", "_sent", "_ran_dry_at",
+        "_last_arrival", "_last_duration", "_waiting_since",
+    )
+
+    def __init__(self, bytes_per_second: int, interval: float, initial_lead: float, min_lead: float, max_lead: float):
+        self.bytes_per_second = bytes_per_second
+        self.interval = interval
+        self.min_lead = min_lead
+        self.max_lead = max_lead
+        self.jitter = 0.0
+        self.underruns = 0
+        self._boost = max(0.0, initial_lead - min_lead)
+        self.lead = min(max_lead, initial_lead)
+        self._start = None
+        self._sent = 0
+        self._ran_dry_at = None
+        self._last_arrival = None
+        self._last_duration = 0.0
+        self._waiting_since = None
+
+    @property
+    def playing(self) -> bool:
+        return self._start is not None
+
+    def _update_lead(self):
+        lead = self.min_lead + JITTER_FACTOR * self.jitter + self._boost
+        self.lead = min(self.max_lead, lead)
+
+    def on_arrival(self, now: float, size: int):
+        """Updates the jitter estimate with CES audio of `size` bytes."""
+        duration = size / self.bytes_per_second
+        if self._last_arrival is not None:
+            # Audio arriving sooner than the previous chunk lasts is early,
+            # which is harmless; only lateness needs covering.
+            lateness = max(0.0, now - self._last_arrival - self._last_duration)
+            self.jitter += (lateness - self.jitter) * JITTER_GAIN
+            self._update_lead()
+        self._last_arrival = now
+        self._last_duration = duration
+
+    def ready(self, now: float, buffered: int) -> bool:
+        """Returns True once a stream should start with `buffered` bytes queued."""
+        if self._waiting_since is None:
+            self._waiting_since = now
+        target = self.interval + self.lead
+        return buffered >= target * self.bytes_per_second or now - self._waiting_since >= target
+
+    def start(self, now: float):
+        """Starts a stream, counting an underrun if the last one ended early."""
+        if self._ran_dry_at is not None and now - self._ran_dry_at <= UNDERRUN_WINDOW:
+            self.underruns += 1
+            self._boost += UNDERRUN_STEP
+            self._update_lead()
+            metrics.increment("pacer_underruns")
+        self._ran_dry_at = None
+        self._waiting_since = None
+        self._start = now
+        self._sent = 0
+        metrics.increment("pacer_streams")
+        metrics.observe("pacer_lead_ms", self.lead * 1000)
+
+    def pending(self, now: float) -> int:
+        """Returns the bytes due to Genesys at `now` that have not been sent."""
+        due = (now - self._start + self.interval + self.lead) * self.bytes_per_second
+        return int(due) - self._sent
+
+    def on_sent(self, size: int):
+        self._sent += size
+        if self._boost:
+            self._boost *= 0.5 ** (size / self.bytes_per_second / BOOST_HALF_LIFE)
+            self._update_lead()
+
+    def drained(self, now: float) -> bool:
+        """Returns True once Genesys has played everything it was sent."""
+        return now - self._start >= self._sent / self.bytes_per_second
+
+    def stop(self, now: float):
+        """Ends the stream because Genesys ran out of audio at `now`."""
+        self._start = None
+        self._ran_dry_at = now
+        self._last_arrival = None
+
+    def reset(self):
+        """Ends the stream without it counting towards an underrun."""
+        self._start = None
+        self._ran_dry_at = None
+        self._waiting_since = None
+        self._last_arrival = None
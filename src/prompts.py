@@ -0,0 +1,68 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cached prompt audio played to the caller while CES is silent.
+
+Prompts are headerless 8 kHz mu-law files, loaded once at startup. PCMU
+calls play them straight from a read-only memory map, so every session
+shares the same pages; other Genesys formats get one transcoded copy per
+format, made at load time rather than per call.
+"""
+
+import logging
+import mmap
+
+from . import audio, config
+
+logger = logging.getLogger(__name__)
+
+SETUP, WAITING = "setup", "waiting"
+
+PROMPT_ENCODING = "MULAW"
+PROMPT_RATE = 8000
+
+_cache = {}  # (name, Genesys encoding, rate) -> audio
+
+
+def _map(path):
+    with open(path, "rb") as file:
+        return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def load():
+    """Loads the configured prompts for every accepted Genesys format.
+
+    Raises:
+        OSError: If a prompt file cannot be read.
+        ValueError: If a prompt file is empty, which cannot be mapped.
+    """
+    files = {SETUP: config.SETUP_PROMPT_FILE, WAITING: config.WAITING_PROMPT_FILE}
+    for name, path in files.items():
+        if not path:
+            continue
+        mapped = _map(path)
+        for media_format in config.GENESYS_MEDIA_FORMATS:
+            encoding = audio.GENESYS_FORMATS.get(media_format)
+            for rate in audio.GENESYS_RATES.get(media_format, ()):
+                if (encoding, rate) == (PROMPT_ENCODING, PROMPT_RATE):
+                    _cache[name, encoding, rate] = mapped
+                else:
+                    transcoder = audio.Transcoder(PROMPT_ENCODING, PROMPT_RATE, encoding, rate)
+                    _cache[name, encoding, rate] = bytes(transcoder.convert(bytes(mapped)))
+        logger.info("Loaded prompt audio", extra={"log_type": "init", "prompt": name, "path": path, "seconds": round(len(mapped) / PROMPT_RATE, 2)})
+
+
+def get(name: str, encoding: str, rate: int):
+    """Returns the audio of prompt `name` in the given format, or None."""
+    return _cache.get((name, encoding, rate))
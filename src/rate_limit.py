@@ -0,0 +1,111 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-memory token-bucket rate limiting for failed WebSocket upgrades."""
+
+import time
+
+from . import config
+
+# Number of x-api-key characters used as a rate limiting key.
+API_KEY_PREFIX_LENGTH = 8
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by string, evicted once idle for `ttl` seconds.
+
+    Buckets start full with `burst` tokens and refill at `rate` tokens per
+    second. Only failed attempts consume tokens, so well-behaved clients are
+    never throttled. A bucket that has been idle for `burst / rate` seconds
+    is full again, so evicting it after `ttl` seconds loses no state as long
+    as `ttl` is at least that long.
+    """
+
+    def __init__(self, rate: float, burst: int, ttl: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> [tokens, last_update]
+        self._next_sweep = 0.0
+
+    def _tokens(self, bucket, now):
+        return min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def is_limited(self, key: str, now: float = None) -> bool:
+        """Returns True if `key` has no tokens left."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+        return self._tokens(bucket, now) < 1
+
+    def consume(self, key: str, now: float = None):
+        """Takes one token from the bucket for `key`."""
+        if now is None:
+            now = time.monotonic()
+        self._maybe_sweep(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.burst - 1, now]
+            return
+        bucket[0] = max(0.0, self._tokens(bucket, now) - 1)
+        bucket[1] = now
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _maybe_sweep(self, now):
+        if now < self._next_sweep and len(self._buckets) < self.max_keys:
+            return
+        self._next_sweep = now + self.ttl
+        cutoff = now - self.ttl
+        for key in [k for k, bucket in self._buckets.items() if bucket[1] < cutoff]:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            # Still full after TTL eviction: drop the least recently used half.
+            by_age = sorted(self._buckets, key=lambda k: self._buckets[k][1])
+            for key in by_age[: len(by_age) // 2]:
+                del self._buckets[key]
+
+
+def client_address(connection, request) -> str:
+    """Returns the address used to rate limit a request.
+
+    Behind Cloud Run or a load balancer the socket peer is a Google front
+    end, so the client is taken from `X-Forwarded-For`. Proxies append to
+    that header, so the entry `AUTH_RATE_LIMIT_XFF_DEPTH` from the end is
+    the one written by the trusted front end rather than by the caller.
+    """
+    depth = config.AUTH_RATE_LIMIT_XFF_DEPTH
+    forwarded_for = request.headers.get("X-Forwarded-For") if depth > 0 else None
+    if forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",")]
+        if len(hops) >= depth:
+            return hops[-depth]
+    remote_address = connection.remote_address
+    return remote_address[0] if remote_address else ""
+
+
+def api_key_prefix(request) -> str:
+    """Returns the rate limiting key for the request's x-api-key header."""
+    return (request.headers.get("x-api-key") or "")[:API_KEY_PREFIX_LENGTH]
+
+
+upgrade_limiter = TokenBucketLimiter(
+    rate=config.AUTH_RATE_LIMIT_PER_SEC,
+    burst=config.AUTH_RATE_LIMIT_BURST,
+    ttl=config.AUTH_RATE_LIMIT_TTL,
+)
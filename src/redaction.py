@@ -14,38 +14,76 @@
 
 """Handles redaction of sensitive data."""
 
-import copy
+import base64
 import json
 
-from .config import LOG_UNREDACTED_DATA
+# The byte value of a silent sample in each audio encoding. A zero mu-law
+# byte is close to full scale, not silence.
+SILENCE_BYTES = {"MULAW": b"\xff", "LINEAR16": b"\x00"}
 
 REDACT_KEYS = ["inputVariables", "participant", "variables", "outputVariables", "output_variables", "diagnosticInfo", "params", "text"]
 
 
+def unredacted() -> bool:
+    """Returns True if LOG_UNREDACTED_DATA is 'true'.
+
+    The configuration is imported on first use rather than with this
+    module, so that offload workers can use `dict_redact` without loading
+    it (and resolving its secrets) again.
+    """
+    from .config import LOG_UNREDACTED_DATA
+    return LOG_UNREDACTED_DATA == 'true'
+
+
 def redact_value(value: any) -> any:
     """Returns '<REDACTED>' if LOG_UNREDACTED_DATA is not 'true'."""
-    if LOG_UNREDACTED_DATA == 'true':
+    if unredacted():
         return value
     return "<REDACTED>"
 
 
+def redact_audio(data: bytes | str, encoding: str = "MULAW") -> bytes | str:
+    """Replaces audio with silence of the same length if LOG_UNREDACTED_DATA is not 'true'.
+
+    Base64-encoded audio is replaced by base64 silence of the same decoded
+    length, so redacted audio keeps its original timing and sizes.
+
+    Args:
+        data: Raw audio, or base64-encoded audio as a string.
+        encoding: The encoding of the audio, `MULAW` or `LINEAR16`.
+    """
+    if unredacted():
+        return data
+    silence = SILENCE_BYTES[encoding]
+    if isinstance(data, str):
+        padding = len(data) - len(data.rstrip("="))
+        return base64.b64encode(silence * (len(data) * 3 // 4 - padding)).decode("ascii")
+    return silence * len(data)
+
+
 def dict_redact(data: dict) -> dict:
     """Recursively redacts a dictionary without mutating the original.
 
+    Dictionaries are copied as they are redacted, so redacted subtrees are
+    never copied. Other values are shared with the original, which is fine
+    for the read-only copies made for logging.
+
     Args:
         data: The dictionary to redact.
 
     Returns:
         The redacted dictionary copy.
     """
-    data_copy = copy.deepcopy(data)
-    for key, value in data_copy.items():
+    data_copy = {}
+    for key, value in data.items():
         if key in REDACT_KEYS:
             data_copy[key] = "<REDACTED>"
         elif isinstance(value, dict):
             data_copy[key] = dict_redact(value)
         elif isinstance(value, list):
             data_copy[key] = [dict_redact(item) if isinstance(item, dict) else item for item in value]
+        else:
+            data_copy[key] = value
     return data_copy
 
 
@@ -62,7 +100,7 @@ def redact(data: str | dict) -> str | dict:
     Returns:
         The redacted data (string or dictionary).
     """
-    if LOG_UNREDACTED_DATA == 'true':
+    if unredacted():
         return data
 
     if isinstance(data, dict):
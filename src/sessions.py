@@ -0,0 +1,129 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Registry of the sessions currently handled by this instance."""
+
+import asyncio
+import time
+
+from . import metrics
+
+# CPU time is measured on one call in this many per handler and scaled up.
+CPU_SAMPLE_INTERVAL = 16
+
+# Handlers whose CPU time is attributed to a session.
+TEXT, BINARY, LISTEN, PACER = range(4)
+CPU_AREAS = ("text", "binary", "listen", "pacer")
+
+_active = {}  # adapter_session_id -> GenesysWS
+
+
+class CpuUsage:
+    """Sampled thread CPU time spent in one session's handlers.
+
+    Callers time a sampled call with `time.thread_time_ns()` and pass the
+    start to `add`. Only calls that run to the end without yielding to the
+    event loop are counted: once a call is suspended, the thread runs other
+    sessions' work, which would be charged to this one. A handler can also
+    call `skip` to drop the current sample.
+    """
+
+    __slots__ = ("_ns", "_calls", "_skipped", "_watches")
+
+    def __init__(self):
+        self._ns = [0] * len(CPU_AREAS)
+        self._calls = [0] * len(CPU_AREAS)
+        self._skipped = [False] * len(CPU_AREAS)
+        self._watches = [None] * len(CPU_AREAS)
+
+    def sampled(self, area: int) -> bool:
+        """Returns True if this call of `area` should be timed."""
+        self._calls[area] += 1
+        if self._calls[area] % CPU_SAMPLE_INTERVAL:
+            return False
+        self._skipped[area] = False
+        if self._watches[area]:
+            self._watches[area].cancel()
+        # The loop only runs this callback if the call yields before `add`.
+        self._watches[area] = asyncio.get_running_loop().call_soon(self.skip, area)
+        return True
+
+    def skip(self, area: int):
+        self._skipped[area] = True
+
+    def add(self, area: int, started_ns: int):
+        self._watches[area].cancel()
+        self._watches[area] = None
+        if not self._skipped[area]:
+            self._ns[area] += (time.thread_time_ns() - started_ns) * CPU_SAMPLE_INTERVAL
+
+    def total_ms(self) -> float:
+        return sum(self._ns) / 1e6
+
+    def by_area_ms(self) -> dict:
+        return {area: round(ns / 1e6, 1) for area, ns in zip(CPU_AREAS, self._ns)}
+
+
+def register(session):
+    _active[session.adapter_session_id] = session
+
+
+def unregister(session):
+    _active.pop(session.adapter_session_id, None)
+
+
+def active() -> list:
+    return list(_active.values())
+
+
+def get(adapter_session_id: str):
+    return _active.get(adapter_session_id)
+
+
+def _state(session) -> str:
+    ces_ws = session.ces_ws
+    if session.disconnect_initiated:
+        return "disconnecting"
+    if session.is_probe:
+        return "probe"
+    if session.paused:
+        return "paused"
+    if ces_ws and ces_ws.is_connected() and ces_ws.pre_connect_audio is None:
+        return "active"
+    if ces_ws and ces_ws.pre_connect_audio is not None:
+        return "connecting"
+    return "opening"
+
+
+def describe(session, now: float = None) -> dict:
+    """Returns a row of the live session table for `session`."""
+    now = time.monotonic() if now is None else now
+    age = max(now - session.started_at, 1e-3)
+    ces_ws = session.ces_ws
+    return {
+        "adapter_session_id": session.adapter_session_id,
+        "conversation_id": session.conversation_id,
+        "state": _state(session),
+        "age_seconds": round(age, 1),
+        "output_queue_chunks": ces_ws.audio_out_queue.qsize() if ces_ws and ces_ws.audio_out_queue else 0,
+        "pacer_buffer_bytes": len(ces_ws.pacer_send_buffer) if ces_ws and ces_ws.pacer_send_buffer else 0,
+        "pre_connect_buffer_bytes": len(ces_ws.pre_connect_audio) if ces_ws and ces_ws.pre_connect_audio else 0,
+        "inbound_bytes_per_second": round(session.received_bytes / age),
+        "outbound_bytes_per_second": round(session.sent_bytes / age),
+        "cpu_ms": round(session.cpu.total_ms(), 1),
+        "cpu_ms_by_handler": session.cpu.by_area_ms(),
+    }
+
+
+metrics.register_provider("active_sessions", lambda: len(_active))
@@ -0,0 +1,200 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Named transport profiles for the Genesys and CES WebSocket legs."""
+
+import time
+
+from websockets.asyncio.client import ClientConnection
+from websockets.asyncio.server import ServerConnection
+
+from . import config, metrics
+
+# Maximum WebSocket message size accepted on either leg.
+MAX_MESSAGE_SIZE = 4 * 1024 * 1024
+
+# Send CPU time is measured on one send in this many and scaled up, since
+# reading the thread CPU clock on every audio frame is not free.
+CPU_SAMPLE_INTERVAL = 16
+
+PROFILES = {
+    # The `websockets` library defaults.
+    "default": {
+        "ping_interval": 20,
+        "ping_timeout": 20,
+        "max_queue": 16,
+        "write_limit": 2**15,
+    },
+    # Small buffers so audio never queues behind a slow reader, and quick
+    # keepalives so dead peers are noticed early.
+    "low_latency": {
+        "ping_interval": 10,
+        "ping_timeout": 10,
+        "max_queue": 4,
+        "write_limit": 2**13,
+    },
+    # Many long-lived calls per process: fewer keepalive wakeups, and larger
+    # buffers to absorb bursts without pausing the reader.
+    "high_density": {
+        "ping_interval": 60,
+        "ping_timeout": 30,
+        "max_queue": 32,
+        "write_limit": 2**16,
+    },
+}
+
+
+def get_profile(name: str = None) -> dict:
+    """Returns the named profile, falling back to `default` if it is unknown."""
+    return PROFILES.get(name or config.TRANSPORT_PROFILE, PROFILES["default"])
+
+
+def _compression(policy: str):
+    return "deflate" if policy == "deflate" else None
+
+
+def _websocket_options(profile: dict, compression: str) -> dict:
+    return {
+        "max_size": MAX_MESSAGE_SIZE,
+        "compression": _compression(compression),
+        "ping_interval": profile["ping_interval"],
+        "ping_timeout": profile["ping_timeout"],
+        "max_queue": profile["max_queue"],
+        "write_limit": profile["write_limit"],
+    }
+
+
+def server_options() -> dict:
+    """Returns keyword arguments for `websockets.serve` (the Genesys leg)."""
+    options = _websocket_options(get_profile(), config.GENESYS_WS_COMPRESSION)
+    options["close_timeout"] = config.GENESYS_CLOSE_TIMEOUT_MS / 1000
+    options["create_connection"] = GenesysConnection
+    return options
+
+
+def client_options() -> dict:
+    """Returns keyword arguments for `websockets.connect` (the CES leg)."""
+    options = _websocket_options(get_profile(), config.CES_WS_COMPRESSION)
+    options["close_timeout"] = config.CES_CLOSE_TIMEOUT_MS / 1000
+    options["create_connection"] = CesConnection
+    return options
+
+
+class LegStats:
+    """Byte counters and sampled send CPU time for one WebSocket leg.
+
+    `sent_bytes` and `received_bytes` count what crosses the transport, after
+    framing and compression; the payload counters count messages before
+    compression. Their ratio is what a compression policy saves on the leg.
+    """
+
+    __slots__ = (
+        "sent_bytes", "received_bytes", "payload_sent_bytes",
+        "payload_received_bytes", "send_cpu_ns", "_sends",
+    )
+
+    def __init__(self):
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        self.payload_sent_bytes = 0
+        self.payload_received_bytes = 0
+        self.send_cpu_ns = 0
+        self._sends = 0
+
+    async def send(self, websocket, payload):
+        """Sends `payload` on `websocket` and accounts for it.
+
+        A send only yields to the event loop when flow control pauses the
+        writer. Samples during which the writer was paused are dropped, so
+        the send CPU time is that of framing and compression alone.
+        """
+        self._sends += 1
+        # Text payloads are JSON from json.dumps, which is ASCII.
+        self.payload_sent_bytes += len(payload)
+        pauses = getattr(websocket, "write_pauses", None)
+        if self._sends % CPU_SAMPLE_INTERVAL or pauses is None or websocket.paused:
+            await websocket.send(payload)
+            return
+        started = time.thread_time_ns()
+        await websocket.send(payload)
+        if websocket.write_pauses == pauses:
+            self.send_cpu_ns += (time.thread_time_ns() - started) * CPU_SAMPLE_INTERVAL
+
+    def received(self, payload):
+        self.payload_received_bytes += len(payload)
+
+    def snapshot(self) -> dict:
+        return {
+            "sent_bytes": self.sent_bytes,
+            "received_bytes": self.received_bytes,
+            "payload_sent_bytes": self.payload_sent_bytes,
+            "payload_received_bytes": self.payload_received_bytes,
+            "send_cpu_ms": self.send_cpu_ns // 1_000_000,
+        }
+
+
+genesys_leg = LegStats()
+ces_leg = LegStats()
+
+
+class _CountingTransport:
+    """Transport wrapper that counts the bytes written to it."""
+
+    __slots__ = ("_transport", "_leg")
+
+    def __init__(self, transport, leg):
+        self._transport = transport
+        self._leg = leg
+
+    def write(self, data):
+        self._leg.sent_bytes += len(data)
+        self._transport.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._transport, name)
+
+
+class _LegConnection:
+    """Accounts a connection's wire bytes and write pauses to its leg."""
+
+    leg = None
+    write_pauses = 0
+
+    def connection_made(self, transport):
+        super().connection_made(_CountingTransport(transport, self.leg))
+
+    def data_received(self, data):
+        self.leg.received_bytes += len(data)
+        super().data_received(data)
+
+    def pause_writing(self):
+        self.write_pauses += 1
+        super().pause_writing()
+
+
+class GenesysConnection(_LegConnection, ServerConnection):
+    leg = genesys_leg
+
+
+class CesConnection(_LegConnection, ClientConnection):
+    leg = ces_leg
+
+
+metrics.register_provider(
+    "legs",
+    lambda: {
+        "genesys": dict(genesys_leg.snapshot(), compression=config.GENESYS_WS_COMPRESSION),
+        "ces": dict(ces_leg.snapshot(), compression=config.CES_WS_COMPRESSION),
+    },
+)
@@ -0,0 +1,101 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Disconnects sessions that are stuck or have run for too long.
+
+One task checks every live session each interval, so the cost does not
+grow with per-session timers.
+"""
+
+import asyncio
+import logging
+import time
+
+from . import config, metrics, sessions
+
+logger = logging.getLogger(__name__)
+
+# Seconds a reaped session gets to finish its `disconnect` before the
+# Genesys connection is closed from this side.
+DISCONNECT_GRACE = 5.0
+
+# Reaped sessions stay here until they have been unregistered, so that a
+# session is not reaped again while it tears down.
+_reaping = {}  # adapter_session_id -> reap task
+
+
+def stuck_reason(session, now: float) -> str | None:
+    """Returns why `session` should be reaped, or None if it is healthy."""
+    if config.MAX_CALL_DURATION_MS and now - session.started_at > config.MAX_CALL_DURATION_MS / 1000:
+        return "max_duration"
+    if config.GENESYS_IDLE_TIMEOUT_MS and now - session.last_received_at > config.GENESYS_IDLE_TIMEOUT_MS / 1000:
+        return "genesys_idle"
+    ces_ws = session.ces_ws
+    if (
+        config.CES_IDLE_TIMEOUT_MS
+        and not session.paused
+        and ces_ws
+        and ces_ws.last_received_at
+        and ces_ws.is_connected()
+        and now - ces_ws.last_received_at > config.CES_IDLE_TIMEOUT_MS / 1000
+    ):
+        return "ces_idle"
+    return None
+
+
+async def _reap(session, reason):
+    state = sessions.describe(session)
+    try:
+        await session.reap(reason, DISCONNECT_GRACE)
+    except Exception:
+        logger.error("Error reaping session", exc_info=True, extra={"log_type": "watchdog_error", "adapter_session_id": session.adapter_session_id})
+    reclaimed = state["pacer_buffer_bytes"] + state["pre_connect_buffer_bytes"]
+    metrics.increment(f"watchdog_reaped_{reason}")
+    metrics.increment("watchdog_reclaimed_buffer_bytes", reclaimed)
+    logger.info("Watchdog reaped session", extra={
+        "log_type": "watchdog_reaped",
+        "adapter_session_id": session.adapter_session_id,
+        "reason": reason,
+        "age_seconds": state["age_seconds"],
+        "reclaimed_buffer_bytes": reclaimed,
+        "reclaimed_queue_chunks": state["output_queue_chunks"],
+    })
+
+
+def check(now: float = None):
+    """Starts reaping every stuck session that is not being reaped yet."""
+    now = time.monotonic() if now is None else now
+    for adapter_session_id, task in list(_reaping.items()):
+        if task.done() and sessions.get(adapter_session_id) is None:
+            del _reaping[adapter_session_id]
+    for session in sessions.active():
+        if session.adapter_session_id in _reaping:
+            continue
+        reason = stuck_reason(session, now)
+        if reason:
+            _reaping[session.adapter_session_id] = asyncio.create_task(_reap(session, reason))
+
+
+async def run(interval: float):
+    """Checks the live sessions every `interval` seconds, forever."""
+    while True:
+        await asyncio.sleep(interval)
+        check()
+
+
+def enabled() -> bool:
+    return bool(config.GENESYS_IDLE_TIMEOUT_MS or config.CES_IDLE_TIMEOUT_MS or config.MAX_CALL_DURATION_MS)
+
+
+metrics.register_provider("watchdog_reaping", lambda: len(_reaping))